@@ -1,3 +1,5 @@
+from collections import deque
+
 import networkx as nx
 import matplotlib.pyplot as plt
 
@@ -10,10 +12,18 @@ class Graph:
         self.find_all_nodes(self.starting_node)
 
     def find_all_nodes(self, node):
-        for neighbour in node.neighbour_nodes:
-            if neighbour not in self.all_nodes:
-                self.all_nodes.append(neighbour)
-                self.find_all_nodes(neighbour)
+        # Depth first with an explicit stack and a seen set, nodes are listed in the order they are found
+        seen = set(self.all_nodes)
+        stack = [iter(node.neighbour_nodes)]
+        while stack:
+            for neighbour in stack[-1]:
+                if neighbour not in seen:
+                    seen.add(neighbour)
+                    self.all_nodes.append(neighbour)
+                    stack.append(iter(neighbour.neighbour_nodes))
+                    break
+            else:
+                stack.pop()
 
     def print_graph(self):
         for node in self.all_nodes:
@@ -33,31 +43,117 @@ class Graph:
                 font_weight='bold')
         plt.show()
 
-    def backtrack_search(self):
-        # Check if the conditions hold, if not return false
-        # If everything fine, and there are no nodes with no value return True
-        is_unset = False
-        for node in self.all_nodes:
-            for neighbour in node.neighbour_nodes:
-                if node.value == '' or neighbour.value == '':
-                    is_unset = True
-                    continue
-                elif node.value == neighbour.value:
-                    return False
-        if not is_unset:
+    def backtrack_search(self, inference='forward_checking'):
+        # Every node keeps a domain of the values still allowed next to its neighbours, nodes with a value
+        # start with just that one. The next node is the one with the fewest values left, ties broken by
+        # the most unassigned neighbours, and its values are tried from the one that removes the fewest
+        # values of its neighbours. After every assignment 'forward_checking' removes the value from the
+        # neighbours, 'ac3' also removes the values that conflict with a neighbour left with one value.
+        # Removed values are undone from a trail on backtracking. The assignment is written back to
+        # Node.value only when it is complete, returns whether one was found.
+        if inference not in ('forward_checking', 'ac3'):
+            raise Exception('Invalid inference')
+        neighbours = {node: [neighbour for neighbour in node.neighbour_nodes if neighbour is not node]
+                      for node in self.all_nodes}
+        domains = {node: {node.value} if node.value != '' else set(self.constraints) for node in self.all_nodes}
+        rank = {value: i for i, value in enumerate(self.constraints)}
+        assignment = {}
+        free_degree = {node: len(neighbours[node]) for node in self.all_nodes}  # Unassigned neighbours
+        trail = []  # (node, removed value)
+
+        def remove(node, value):
+            domains[node].discard(value)
+            trail.append((node, value))
+
+        def undo(mark):
+            while len(trail) > mark:
+                node, value = trail.pop()
+                domains[node].add(value)
+
+        def revise(node, other):
+            # Removes the value of other from node when it is the only one other has left
+            if len(domains[other]) == 1:
+                value = next(iter(domains[other]))
+                if value in domains[node]:
+                    remove(node, value)
+                    return True
+            return False
+
+        def ac3(arcs):
+            queue = deque(arcs)
+            while queue:
+                node, other = queue.popleft()
+                if revise(node, other):
+                    if not domains[node]:
+                        return False
+                    queue.extend((neighbour, node) for neighbour in neighbours[node] if neighbour is not other)
             return True
 
-        # Assign new Values in recursive loop
-        for node in self.all_nodes:
-            if node.value != '':
+        def unassign(node):
+            del assignment[node]
+            for neighbour in neighbours[node]:
+                free_degree[neighbour] += 1
+
+        def assign(node, value):
+            assignment[node] = value
+            for neighbour in neighbours[node]:
+                free_degree[neighbour] -= 1
+            for other in list(domains[node]):
+                if other != value:
+                    remove(node, other)
+            if inference == 'ac3':
+                return ac3((neighbour, node) for neighbour in neighbours[node])
+            for neighbour in neighbours[node]:
+                if value in domains[neighbour]:
+                    if neighbour in assignment:
+                        return False
+                    remove(neighbour, value)
+                    if not domains[neighbour]:
+                        return False
+            return True
+
+        def select_node():
+            return min((node for node in self.all_nodes if node not in assignment),
+                       key=lambda node: (len(domains[node]), -free_degree[node]))
+
+        def order_values(node):
+            return sorted(domains[node], key=lambda value: (
+                sum(value in domains[neighbour] for neighbour in neighbours[node] if neighbour not in assignment),
+                rank.get(value, len(rank))))
+
+        # Nodes given a value first, they must agree with each other and are pruned from their neighbours
+        initial = [(node, node.value) for node in self.all_nodes if node.value != '']
+        if any(not assign(node, value) for node, value in initial):
+            return False
+        if inference == 'ac3' and not ac3((node, neighbour) for node in self.all_nodes for neighbour in neighbours[node]):
+            return False
+
+        stack = []  # [node, values left to try, trail length before the node was assigned]
+        if len(assignment) < len(self.all_nodes):
+            node = select_node()
+            stack.append((node, iter(order_values(node)), len(trail)))
+        while len(assignment) < len(self.all_nodes):
+            if not stack:
+                return False
+            node, values, mark = stack[-1]
+            undo(mark)
+            if node in assignment:
+                unassign(node)
+            for value in values:
+                if assign(node, value):
+                    break
+                undo(mark)
+                unassign(node)
+            else:
+                stack.pop()
                 continue
-            for constraint in self.constraints:
-                node.value = constraint
-                if self.backtrack_search():
-                    return True
-                else:
-                    node.value = ''
-        return False  # Return False if no correct configuration was found
+            if len(assignment) < len(self.all_nodes):
+                next_node = select_node()
+                stack.append((next_node, iter(order_values(next_node)), len(trail)))
+
+        for node, value in assignment.items():
+            node.value = value
+        return True
 
 
 class Node:
@@ -105,6 +201,6 @@ if __name__ == '__main__':
     graph = Graph(node_1, ['Mon', 'Tue', 'Wed', 'Thu', 'Fri'])
     graph.print_graph()
 
-    # Call the back track search that will assign value to each node
+    # Call the back track search that will assign value to each node, inference='ac3' propagates further
     print('\nWas backtrack Successful:', graph.backtrack_search(), '\n')
     graph.visualize_graph()
@@ -1,87 +1,346 @@
-import copy
+import math
 import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+# The four single cell moves of a hospital in the order hill climbing tries them
+MOVES = np.array([(-1, 0), (1, 0), (0, -1), (0, 1)], dtype=np.int64)
+# Distance standing in for a missing hospital, small enough to be added up without overflow
+UNREACHABLE = np.iinfo(np.int64).max // 4
+# Below this many hospitals comparing every house with every hospital is faster than HospitalGrid
+GRID_MIN_HOSPITALS = 64
+
+
+def block_rows(num_of_columns, max_bytes):
+    # Houses per block so that a few int64 (houses, num_of_columns) arrays stay within max_bytes
+    return max(1, max_bytes // (4 * 8 * max(num_of_columns, 1)))
+
+
+def weighted_choice(cumulative, rng):
+    # Index drawn with probability proportional to its weight given the cumulative weights, uniformly
+    # when every weight is zero
+    if cumulative[-1] == 0:
+        return rng.randrange(len(cumulative))
+    index = int(np.searchsorted(cumulative, rng.random() * cumulative[-1], side='right'))
+    # rng.random() * cumulative[-1] can round up to the total
+    return min(index, len(cumulative) - 1)
+
+
+def manhattan_distances(houses, positions):
+    # (houses, positions) matrix of the L1 distances
+    return (np.abs(houses[:, None, 0] - positions[None, :, 0])
+            + np.abs(houses[:, None, 1] - positions[None, :, 1]))
+
+
+def nearest_two(houses, hospitals, max_bytes):
+    # Distance to the nearest and second nearest hospital and the index of the nearest one of every house
+    nearest = np.full(len(houses), UNREACHABLE, dtype=np.int64)
+    second = np.full(len(houses), UNREACHABLE, dtype=np.int64)
+    nearest_index = np.zeros(len(houses), dtype=np.intp)
+    if len(hospitals) == 0:
+        return nearest, second, nearest_index
+    rows = block_rows(len(hospitals), max_bytes)
+    for first in range(0, len(houses), rows):
+        distances = manhattan_distances(houses[first:first + rows], hospitals)
+        nearest_index[first:first + rows] = distances.argmin(axis=1)
+        if len(hospitals) == 1:
+            nearest[first:first + rows] = distances[:, 0]
+        else:
+            two = np.partition(distances, 1, axis=1)
+            nearest[first:first + rows] = two[:, 0]
+            second[first:first + rows] = two[:, 1]
+    return nearest, second, nearest_index
+
+
+def grid_cell_size(cells, count):
+    # Side of square buckets that hold about count of them over the bounding box of cells
+    cells = np.asarray(cells).reshape(-1, 2)
+    span = cells.max(axis=0) - cells.min(axis=0) + 1 if len(cells) else (1, 1)
+    return max(1, int(math.sqrt(int(span[0]) * int(span[1]) / max(count, 1))))
+
+
+def bucket_groups(houses, cell_size):
+    # Houses grouped by their bucket: the (bucket row, bucket column) of every group, the houses ordered
+    # by group and where every group starts in that order
+    buckets = houses // cell_size
+    if len(houses) == 0:
+        return buckets, np.zeros(0, dtype=np.intp), np.zeros(1, dtype=np.intp)
+    lowest = buckets.min(axis=0)
+    codes = (buckets[:, 0] - lowest[0]) * (int(buckets[:, 1].max() - lowest[1]) + 1) + buckets[:, 1] - lowest[1]
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.concatenate(([True], sorted_codes[1:] != sorted_codes[:-1])))
+    return buckets[order[starts]], order, np.append(starts, len(houses))
+
+
+class HospitalGrid:
+    # Hospitals bucketed into square cells of cell_size x cell_size grid cells. A hospital whose bucket is
+    # more than k buckets away from the bucket of a house in rows or columns is more than k * cell_size away
+    # from it in L1, so the nearest two of a house are found by searching the buckets around its own.
+
+    def __init__(self, hospitals, cell_size=None):
+        self.hospitals = np.array(hospitals, dtype=np.int64).reshape(-1, 2)
+        if cell_size is None:
+            # About one hospital per bucket
+            cell_size = grid_cell_size(self.hospitals, len(self.hospitals))
+        self.cell_size = cell_size
+        self.buckets = {}  # (bucket row, bucket column) -> indices of the hospitals in it
+        for i, bucket in enumerate(map(tuple, (self.hospitals // cell_size).tolist())):
+            self.buckets.setdefault(bucket, []).append(i)
+
+    def bucket(self, position):
+        return int(position[0]) // self.cell_size, int(position[1]) // self.cell_size
+
+    def move(self, i, position):
+        old_bucket = self.bucket(self.hospitals[i])
+        self.hospitals[i] = position
+        new_bucket = self.bucket(self.hospitals[i])
+        if new_bucket != old_bucket:
+            self.buckets[old_bucket].remove(i)
+            if not self.buckets[old_bucket]:
+                del self.buckets[old_bucket]
+            self.buckets.setdefault(new_bucket, []).append(i)
+
+    def candidates(self, bucket_row, bucket_column, radius):
+        # Indices of the hospitals at most radius buckets away, all of them once the square is bigger than
+        # the number of non-empty buckets
+        if (2 * radius + 1) ** 2 >= len(self.buckets):
+            return np.arange(len(self.hospitals))
+        indices = []
+        for row in range(bucket_row - radius, bucket_row + radius + 1):
+            for column in range(bucket_column - radius, bucket_column + radius + 1):
+                indices.extend(self.buckets.get((row, column), ()))
+        return np.array(indices, dtype=np.intp)
+
+    def nearest_two(self, houses, max_bytes=64 * 1024 ** 2, groups=None):
+        # Same result as nearest_two(houses, self.hospitals, max_bytes), every group of houses sharing a bucket
+        # is only compared with the hospitals around it. groups is bucket_groups(houses, self.cell_size) when
+        # the caller keeps it for the same houses, it is worked out here otherwise.
+        houses = np.asarray(houses, dtype=np.int64).reshape(-1, 2)
+        if len(self.hospitals) < GRID_MIN_HOSPITALS:
+            return nearest_two(houses, self.hospitals, max_bytes)
+        nearest = np.full(len(houses), UNREACHABLE, dtype=np.int64)
+        second = np.full(len(houses), UNREACHABLE, dtype=np.int64)
+        nearest_index = np.zeros(len(houses), dtype=np.intp)
+        if len(houses) == 0:
+            return nearest, second, nearest_index
+        keys, order, bounds = bucket_groups(houses, self.cell_size) if groups is None else groups
+        needed = min(2, len(self.hospitals))
+        for group, (bucket_row, bucket_column) in enumerate(keys.tolist()):
+            members = order[bounds[group]:bounds[group + 1]]
+            radius = 0
+            candidates = self.candidates(bucket_row, bucket_column, radius)
+            while len(candidates) < needed:
+                radius += 1
+                candidates = self.candidates(bucket_row, bucket_column, radius)
+            result = nearest_two(houses[members], self.hospitals[candidates], max_bytes)
+            # Everything within the worst found distance lies at most this many buckets away
+            reach = int(result[needed - 1].max()) // self.cell_size + 1
+            if reach > radius and len(candidates) < len(self.hospitals):
+                candidates = self.candidates(bucket_row, bucket_column, reach)
+                result = nearest_two(houses[members], self.hospitals[candidates], max_bytes)
+            nearest[members], second[members] = result[0], result[1]
+            nearest_index[members] = candidates[result[2]]
+        return nearest, second, nearest_index
+
+
+class NearestHospitals:
+    # Distance of every house to its nearest and second nearest hospital. Without hospital i a house is
+    # served at its second distance if i is its nearest hospital and at its nearest distance otherwise,
+    # so the cost of any single hospital move follows from these arrays and the distances to the new cell.
+    # The nearest two are looked up in a HospitalGrid that follows the hospitals as they move.
+
+    def __init__(self, houses, hospitals, max_bytes=64 * 1024 ** 2, cell_size=None, groups=None):
+        self.houses = np.asarray(houses, dtype=np.int64).reshape(-1, 2)
+        self.index = HospitalGrid(hospitals, cell_size)
+        self.hospitals = self.index.hospitals
+        self.max_bytes = max_bytes
+        self.nearest, self.second, self.nearest_index = self.index.nearest_two(self.houses, max_bytes, groups)
+        self.total = int(self.nearest.sum()) if len(self.hospitals) else float('inf')
+
+    def move_costs(self, indices, positions):
+        # The cost after every single move of hospital indices[m] to positions[m], all moves scored in one call.
+        # A house at distance d from hospital i is at least d - step from a cell step away from i, so only
+        # houses with d - step below their distance without i can gain from the move, the rest add that distance.
+        indices = np.asarray(indices, dtype=np.intp)
+        positions = np.asarray(positions, dtype=np.int64).reshape(-1, 2)
+        steps = np.abs(positions - self.hospitals[indices]).sum(axis=1)
+        moved, groups = np.unique(indices, return_inverse=True)
+        group_moves = [np.flatnonzero(groups == group) for group in range(len(moved))]
+        costs = np.zeros(len(indices), dtype=np.int64)
+        rows = block_rows(len(moved), self.max_bytes)
+        for first in range(0, len(self.houses), rows):
+            houses = self.houses[first:first + rows]
+            distances = manhattan_distances(houses, self.hospitals[moved])
+            others = np.where(self.nearest_index[first:first + rows, None] == moved[None, :],
+                              self.second[first:first + rows, None], self.nearest[first:first + rows, None])
+            base = others.sum(axis=0)
+            for group, moves in enumerate(group_moves):
+                reach = np.flatnonzero(distances[:, group] - steps[moves].max() < others[:, group])
+                reach_others = others[reach, group][:, None]
+                gains = np.minimum(manhattan_distances(houses[reach], positions[moves]) - reach_others, 0)
+                costs[moves] += base[group] + gains.sum(axis=0)
+        return costs
+
+    def move_cost(self, i, position):
+        return int(self.move_costs([i], [position])[0])
+
+    def move(self, i, position):
+        old_position = self.hospitals[i].copy()
+        self.index.move(i, position)
+        # Only houses that had or get hospital i among their two nearest can change
+        changed = np.flatnonzero((np.abs(self.houses - old_position).sum(axis=1) <= self.second)
+                                 | (np.abs(self.houses - self.hospitals[i]).sum(axis=1) <= self.second))
+        nearest, second, nearest_index = self.index.nearest_two(self.houses[changed], self.max_bytes)
+        self.total += int(nearest.sum() - self.nearest[changed].sum())
+        self.nearest[changed], self.second[changed], self.nearest_index[changed] = nearest, second, nearest_index
 
 
 class Space:
-    def __init__(self):
-        self.houses = []
-        self.hospitals = []
+    def __init__(self, max_bytes=64 * 1024 ** 2):
+        # Houses and hospitals are (count, 2) int arrays of (row, column)
+        self.houses = np.empty((0, 2), dtype=np.int64)
+        self.hospitals = np.empty((0, 2), dtype=np.int64)
+        # Memory cap of one block of house to hospital distances
+        self.max_bytes = max_bytes
+        # Caches of house_cells, house_groups and hospital_index
+        self.house_cell_set = set()
+        self.house_cells_of = self.houses
+        self.house_groups_of = (None, None)  # (houses, cell size) of self.house_bucket_groups
+        self.house_bucket_groups = None
+        self.hospital_grid = None
 
     def __str__(self):
-        return "<Space | Houses: " + str(self.houses) + " | Hospitals:" + str(self.hospitals) + ">"
+        return ("<Space | Houses: " + str([tuple(house) for house in self.houses.tolist()]) + " | Hospitals:"
+                + str([tuple(hospital) for hospital in self.hospitals.tolist()]) + ">")
 
     def __repr__(self):
         return self.__str__()
 
     def print_city(self):
-        rows = max(max([e[0] for e in self.houses]), max(e[0] for e in self.hospitals))
-        columns = max(max(e[1] for e in self.houses), max(e[1] for e in self.hospitals))
-
-        for row in range(rows + 1):
-            for column in range(columns + 1):
-                if (row, column) in self.houses:
-                    print('P', end='')
-                elif (row, column) in self.hospitals:
-                    print('H', end='')
-                else:
-                    print('-', end='')
-            print()
+        # One character array of the whole city, houses drawn over hospitals
+        rows = max(self.houses[:, 0].max(), self.hospitals[:, 0].max())
+        columns = max(self.houses[:, 1].max(), self.hospitals[:, 1].max())
+        city = np.full((rows + 1, columns + 1), '-', dtype='<U1')
+        city[self.hospitals[:, 0], self.hospitals[:, 1]] = 'H'
+        city[self.houses[:, 0], self.houses[:, 1]] = 'P'
+        print('\n'.join(''.join(line) for line in city.tolist()))
+
+    def house_cells(self):
+        # Set of the (row, column) houses for O(1) occupancy checks, rebuilt only when self.houses is replaced
+        if self.house_cells_of is not self.houses:
+            self.house_cell_set = set(map(tuple, self.houses.tolist()))
+            self.house_cells_of = self.houses
+        return self.house_cell_set
+
+    def grid_cell_size(self, num_of_hospitals):
+        # Buckets sized by the houses, so the houses keep their grouping while the hospitals move around
+        return grid_cell_size(self.houses, num_of_hospitals)
+
+    def house_groups(self, cell_size):
+        # bucket_groups of the houses, worked out again only when self.houses is replaced or the size changes
+        if self.house_groups_of[0] is not self.houses or self.house_groups_of[1] != cell_size:
+            self.house_bucket_groups = bucket_groups(self.houses, cell_size)
+            self.house_groups_of = (self.houses, cell_size)
+        return self.house_bucket_groups
+
+    def hospital_index(self):
+        # HospitalGrid over the current hospitals, rebuilt only when they changed since the last query
+        if self.hospital_grid is None or not np.array_equal(self.hospital_grid.hospitals, self.hospitals):
+            self.hospital_grid = HospitalGrid(self.hospitals, self.grid_cell_size(len(self.hospitals)))
+        return self.hospital_grid
+
+    def nearest_hospitals(self, hospitals=None):
+        # nearest_two of all the houses for hospitals, self.hospitals by default
+        if hospitals is None:
+            index = self.hospital_index()
+        else:
+            index = HospitalGrid(hospitals, self.grid_cell_size(len(hospitals)))
+        return index.nearest_two(self.houses, self.max_bytes, self.house_groups(index.cell_size))
 
     def add_house(self, row, column):
-        self.houses.append((row, column))
+        self.add_houses([(row, column)])
+
+    def add_houses(self, cells):
+        # Adds many (row, column) houses with one copy of the array
+        cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+        up_to_date = self.house_cells_of is self.houses
+        self.houses = np.vstack((self.houses, cells))
+        if up_to_date:
+            self.house_cell_set.update(map(tuple, cells.tolist()))
+            self.house_cells_of = self.houses
 
     def add_hospital(self, row, column):
-        self.hospitals.append((row, column))
+        self.hospitals = np.vstack((self.hospitals, [(row, column)]))
 
     def manhattan_distance_from_nearest_hospital(self, row, column):
-        shortest_manhattan = float('inf')
-        for hospital in self.hospitals:
-            manhattan = abs(hospital[0] - row) + abs(hospital[1] - column)
-            if manhattan < shortest_manhattan:
-                shortest_manhattan = manhattan
-        return shortest_manhattan
+        if len(self.hospitals) == 0:
+            return float('inf')
+        return int(self.hospital_index().nearest_two([(row, column)], self.max_bytes)[0][0])
 
     def cost(self):
-        cost = 0
-        for house in self.houses:
-            cost += self.manhattan_distance_from_nearest_hospital(house[0], house[1])
-        return cost
+        if len(self.houses) == 0:
+            return 0
+        if len(self.hospitals) == 0:
+            return float('inf')
+        return int(self.nearest_hospitals()[0].sum())
+
+    def hill_climb(self, algo_type='steepest', max_iterations=None, time_limit=None, seed=None,
+                   start_temperature=None, end_temperature=None, tabu_tenure=3, patience=None):
+        # All 4 single cell moves of every hospital are scored in one batch by NearestHospitals,
+        # moves onto a house are left out. 'steepest' and 'stochastic' stop in the first local minimum,
+        # 'annealing' and 'tabu' also take worse moves and run until max_iterations or time_limit seconds,
+        # tabu_tenure and patience (2 * hospitals by default) tune tabu_search.
+        # Those two leave the best placement seen in self.hospitals. self.trace holds (seconds, best cost)
+        # of every improvement of the best cost.
+        if algo_type not in ('steepest', 'stochastic', 'annealing', 'tabu'):
+            raise Exception('Invalid algo type')
+        if algo_type in ('annealing', 'tabu') and max_iterations is None and time_limit is None:
+            raise Exception('Annealing and tabu search need max_iterations or time_limit')
+        rng = random if seed is None else random.Random(seed)
+        self.hospitals = np.asarray(self.hospitals, dtype=np.int64).reshape(-1, 2)
+        house_cells = self.house_cells()
+        cell_size = self.grid_cell_size(len(self.hospitals))
+        evaluator = NearestHospitals(self.houses, self.hospitals, self.max_bytes, cell_size, self.house_groups(cell_size))
+        time_start = time.perf_counter()
+        self.trace = [(0., evaluator.total)]
+
+        def progress(iteration):
+            # Used part of the budget between 0 and 1, it is over at 1
+            used = 0.
+            if max_iterations is not None:
+                used = iteration / max(max_iterations, 1)
+            if time_limit is not None:
+                used = max(used, (time.perf_counter() - time_start) / time_limit if time_limit > 0 else 1.)
+            return used
+
+        def record(cost):
+            self.trace.append((time.perf_counter() - time_start, cost))
+
+        if algo_type == 'annealing':
+            self.annealing(evaluator, house_cells, progress, record, rng, start_temperature, end_temperature)
+        elif algo_type == 'tabu':
+            self.tabu_search(evaluator, house_cells, progress, record, rng, tabu_tenure,
+                             2 * len(self.hospitals) if patience is None else patience)
+        else:
+            self.descent(evaluator, house_cells, progress, record, rng, algo_type)
+
+    def descent(self, evaluator, house_cells, progress, record, rng, algo_type):
+        move_indices = np.repeat(np.arange(len(self.hospitals)), len(MOVES))
+        move_steps = np.tile(MOVES, (len(self.hospitals), 1))
 
-    def hill_climb(self, algo_type='steepest'):
         def find_best_neighbor():
-            current_cost = self.cost()
-            better_neighbors = []
-            inner_space = Space()
-            inner_space.houses = copy.deepcopy(self.houses)
-            inner_space.hospitals = copy.deepcopy(self.hospitals)
-            for i in range(len(inner_space.hospitals)):
-                inner_space.hospitals[i] = inner_space.hospitals[i][0] - 1, inner_space.hospitals[i][1]
-                if inner_space.hospitals[i] in inner_space.houses:
-                    pass
-                elif inner_space.cost() < current_cost:
-                    better_neighbors.append((inner_space.cost(), i, -1, 0))
-                inner_space.hospitals = copy.deepcopy(self.hospitals)
-
-                inner_space.hospitals[i] = inner_space.hospitals[i][0] + 1, inner_space.hospitals[i][1]
-                if inner_space.hospitals[i] in inner_space.houses:
-                    pass
-                elif inner_space.cost() < current_cost:
-                    better_neighbors.append((inner_space.cost(), i, 1, 0))
-                inner_space.hospitals = copy.deepcopy(self.hospitals)
-
-                inner_space.hospitals[i] = inner_space.hospitals[i][0], inner_space.hospitals[i][1] - 1
-                if inner_space.hospitals[i] in inner_space.houses:
-                    pass
-                elif inner_space.cost() < current_cost:
-                    better_neighbors.append((inner_space.cost(), i, 0, -1))
-                inner_space.hospitals = copy.deepcopy(self.hospitals)
-
-                inner_space.hospitals[i] = inner_space.hospitals[i][0], inner_space.hospitals[i][1] + 1
-                if inner_space.hospitals[i] in inner_space.houses:
-                    pass
-                elif inner_space.cost() < current_cost:
-                    better_neighbors.append((inner_space.cost(), i, 0, 1))
-                inner_space.hospitals = copy.deepcopy(self.hospitals)
+            current_cost = evaluator.total
+            positions = self.hospitals[move_indices] + move_steps
+            allowed = np.array([tuple(position) not in house_cells for position in positions.tolist()], dtype=bool)
+            if not allowed.any():
+                return None
+            costs = evaluator.move_costs(move_indices[allowed], positions[allowed])
+            better_neighbors = [(cost, i, row_move, column_move) for cost, i, (row_move, column_move)
+                                in zip(costs.tolist(), move_indices[allowed].tolist(), move_steps[allowed].tolist())
+                                if cost < current_cost]
 
             best_neighbor_cost = float('inf')
             best_neighbor_of_hospital = None
@@ -93,42 +352,323 @@ class Space:
             elif algo_type == 'stochastic':
                 if len(better_neighbors) == 0:
                     return None
-                best_neighbor_of_hospital = random.choice(better_neighbors)
+                best_neighbor_of_hospital = rng.choice(better_neighbors)
 
             return best_neighbor_of_hospital
 
+        iteration = 0
         best_neighbor = find_best_neighbor()
-        while best_neighbor is not None:
-            self.hospitals[best_neighbor[1]] = (self.hospitals[best_neighbor[1]][0] + best_neighbor[2]), \
-                (self.hospitals[best_neighbor[1]][1] + best_neighbor[3])
+        while best_neighbor is not None and progress(iteration) < 1:
+            self.hospitals[best_neighbor[1]] += (best_neighbor[2], best_neighbor[3])
+            evaluator.move(best_neighbor[1], self.hospitals[best_neighbor[1]])
+            record(evaluator.total)
+            iteration += 1
             best_neighbor = find_best_neighbor()
+        return iteration
+
+    def annealing(self, evaluator, house_cells, progress, record, rng, start_temperature, end_temperature,
+                  polish_share=0.1):
+        # Simulated annealing over random single cell moves, each scored alone by evaluator.move_cost. It starts
+        # from the local minimum of a steepest descent, so it never ends above it. A move worse by delta is taken
+        # with probability exp(-delta / temperature), the temperature falls geometrically from
+        # start_temperature to end_temperature until the last polish_share of the budget. Without a start
+        # temperature the mean worsening of the moves off the houses in that local minimum is first taken with
+        # probability 0.9, the end temperature is a thousandth of the start one. The rest of the budget is a
+        # steepest descent from the best placement.
+        iteration = self.descent(evaluator, house_cells, progress, record, rng, 'steepest')
+        if start_temperature is None:
+            move_indices = np.repeat(np.arange(len(self.hospitals)), len(MOVES))
+            positions = self.hospitals[move_indices] + np.tile(MOVES, (len(self.hospitals), 1))
+            allowed = np.array([cell not in house_cells for cell in map(tuple, positions.tolist())], dtype=bool)
+            costs = evaluator.move_costs(move_indices[allowed], positions[allowed])
+            worse = costs[costs > evaluator.total] - evaluator.total
+            start_temperature = -float(worse.mean()) / math.log(0.9) if len(worse) else 1.
+        if end_temperature is None:
+            end_temperature = start_temperature / 1000
+        best_cost = evaluator.total
+        best_hospitals = evaluator.hospitals.copy()
+
+        # Share of the annealing part of the budget used so far
+        begin = progress(iteration)
+        length = max(1 - polish_share - begin, 1e-9)
+        used = (progress(iteration) - begin) / length
+        while used < 1:
+            i = rng.randrange(len(evaluator.hospitals))
+            row_move, column_move = MOVES[rng.randrange(len(MOVES))].tolist()
+            position = (int(evaluator.hospitals[i, 0]) + row_move, int(evaluator.hospitals[i, 1]) + column_move)
+            if position not in house_cells:
+                delta = evaluator.move_cost(i, position) - evaluator.total
+                temperature = start_temperature * (end_temperature / start_temperature) ** used
+                if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                    evaluator.move(i, position)
+                    if evaluator.total < best_cost:
+                        best_cost = evaluator.total
+                        best_hospitals = evaluator.hospitals.copy()
+                        record(best_cost)
+            iteration += 1
+            used = (progress(iteration) - begin) / length
+
+        for i in np.flatnonzero((evaluator.hospitals != best_hospitals).any(axis=1)).tolist():
+            evaluator.move(i, best_hospitals[i])
+        self.hospitals = best_hospitals
+        self.descent(evaluator, house_cells, lambda steps: progress(iteration + steps), record, rng, 'steepest')
+
+    def tabu_search(self, evaluator, house_cells, progress, record, rng, tabu_tenure, patience):
+        # Takes the best of all single cell moves every iteration, also when it is worse than staying.
+        # A hospital that moved in the last tabu_tenure iterations may not move, unless the move gives a new
+        # best cost, at most all but one hospital are tabu. After patience iterations without a new best the
+        # search jumps with a relocation move and continues from there.
+        move_indices = np.repeat(np.arange(len(self.hospitals)), len(MOVES))
+        move_steps = np.tile(MOVES, (len(self.hospitals), 1))
+        tabu_tenure = min(tabu_tenure, len(self.hospitals) - 1)
+        tabu_until = np.zeros(len(self.hospitals), dtype=np.int64)  # First iteration the hospital may move in
+        best_cost = evaluator.total
+        best_hospitals = evaluator.hospitals.copy()
+        last_improvement = 0
+
+        iteration = 0
+        while progress(iteration) < 1:
+            if iteration - last_improvement >= patience:
+                i, position, _ = self.relocation(evaluator, house_cells, rng, tabu_until > iteration)
+                last_improvement = iteration
+            else:
+                positions = evaluator.hospitals[move_indices] + move_steps
+                allowed = np.array([cell not in house_cells for cell in map(tuple, positions.tolist())], dtype=bool)
+                if not allowed.any():
+                    break
+                costs = np.full(len(positions), np.iinfo(np.int64).max, dtype=np.int64)
+                costs[allowed] = evaluator.move_costs(move_indices[allowed], positions[allowed])
+                allowed &= (tabu_until[move_indices] <= iteration) | (costs < best_cost)
+                if not allowed.any():
+                    iteration += 1
+                    continue
+                move = int(np.flatnonzero(allowed)[costs[allowed].argmin()])
+                i, position = int(move_indices[move]), positions[move]
+            tabu_until[i] = iteration + tabu_tenure + 1
+            evaluator.move(i, position)
+            if evaluator.total < best_cost:
+                best_cost = evaluator.total
+                best_hospitals = evaluator.hospitals.copy()
+                last_improvement = iteration
+                record(best_cost)
+            iteration += 1
+        self.hospitals = best_hospitals
 
-    def random_restarts(self, num_of_hospitals, num_of_restarts):
-        self.hospitals = []
-        opt_results = []
+    def relocation(self, evaluator, house_cells, rng, tabu, samples=16):
+        # Moves the hospital whose houses lose the least without it to the best of samples free cells next
+        # to houses drawn with probability proportional to their distance from the nearest hospital, like
+        # k-means++ seeding. Tabu hospitals are kept in place while others can move.
+        # Returns the hospital, its new cell and the cost after the move, which can be worse than now.
+        losses = np.bincount(evaluator.nearest_index, weights=np.minimum(evaluator.second, UNREACHABLE // 2)
+                             - evaluator.nearest, minlength=len(evaluator.hospitals))
+        if not tabu.all():
+            losses[tabu] = np.inf
+        i = int(losses.argmin())
+        occupied = set(map(tuple, evaluator.hospitals.tolist())) | house_cells
+        cumulative = np.cumsum(evaluator.nearest)
+        positions = []
+        for _ in range(samples):
+            # Every house can sit next to a hospital, then the houses are drawn uniformly
+            house = weighted_choice(cumulative, rng)
+            row_move, column_move = MOVES[rng.randrange(len(MOVES))].tolist()
+            cell = (int(evaluator.houses[house, 0]) + row_move, int(evaluator.houses[house, 1]) + column_move)
+            if cell not in occupied:
+                positions.append(cell)
+        if not positions:
+            return i, evaluator.hospitals[i].copy(), evaluator.total
+        costs = evaluator.move_costs(np.full(len(positions), i), positions)
+        best = int(costs.argmin())
+        return i, np.array(positions[best], dtype=np.int64), int(costs[best])
 
-        for _ in range(num_of_restarts):
-            while len(self.hospitals) < num_of_hospitals:
-                row = random.randint(0, max([e[0] for e in self.houses]))
-                column = random.randint(0, max(e[1] for e in self.houses))
-                if (row, column) not in self.hospitals and (row, column) not in self.houses:
-                    self.hospitals.append((row, column))
+    def k_medians(self, num_of_hospitals=None, seed=None, max_iterations=100, tolerance=1e-3):
+        # Alternates assigning every house to its nearest hospital and moving every hospital to the
+        # coordinate-wise median of its houses, which minimises the L1 cost of a fixed cluster. Starts from
+        # self.hospitals, or from num_of_hospitals houses picked k-means++ style when given. A median on a house
+        # or on another hospital is replaced by the cheapest free cell nearest to it. Stops when no hospital
+        # moves or a pass lowers the cost by less than the tolerance share of it, and keeps the cheapest
+        # hospitals seen. The result is a good start for hill_climb. self.trace holds (seconds, cost) per pass.
+        rng = random if seed is None else random.Random(seed)
+        time_start = time.perf_counter()
+        if num_of_hospitals is not None:
+            self.hospitals = self.seed_hospitals(num_of_hospitals, rng)
+        hospitals = np.array(self.hospitals, dtype=np.int64).reshape(-1, 2)
+        if len(hospitals) == 0 or len(self.houses) == 0:
+            self.hospitals = hospitals
+            return
+        house_cells = self.house_cells()
+        if (any(cell in house_cells for cell in map(tuple, hospitals.tolist()))
+                or len(np.unique(hospitals, axis=0)) < len(hospitals)):
+            # Seeds are houses, they are moved off them like the medians
+            hospitals = self.free_cells(hospitals, self.nearest_hospitals(hospitals)[2])
+        self.trace = []
+        best_cost = float('inf')
+        best_hospitals = hospitals
 
-            self.hill_climb()
-            opt_results.append((self.cost(), self.hospitals))
-            print('Optimised to:', self.cost())
-            self.hospitals = []
+        for _ in range(max_iterations):
+            nearest, _, clusters = self.nearest_hospitals(hospitals)
+            cost = int(nearest.sum())
+            self.trace.append((time.perf_counter() - time_start, cost))
+            # Moving off the houses can undo the gain of a pass, then the passes could cycle
+            if cost >= best_cost:
+                break
+            converged = cost > best_cost * (1 - tolerance)
+            best_cost, best_hospitals = cost, hospitals
+            if converged:
+                break
+            sizes = np.bincount(clusters, minlength=len(hospitals))
+            medians = hospitals.copy()
+            filled = np.flatnonzero(sizes)
+            # Lower median of every cluster, houses sorted by cluster and then by the coordinate
+            starts = np.concatenate(([0], np.cumsum(sizes)))[filled]
+            middles = starts + (sizes[filled] - 1) // 2
+            for axis in range(2):
+                order = np.lexsort((self.houses[:, axis], clusters))
+                medians[filled, axis] = self.houses[order[middles], axis]
+            # An empty cluster gets the house served worst
+            for i in np.flatnonzero(sizes == 0).tolist():
+                house = int(nearest.argmax())
+                medians[i] = self.houses[house]
+                nearest[house] = 0
+            medians = self.free_cells(medians, clusters)
+            if np.array_equal(medians, hospitals):
+                break
+            hospitals = medians
+        self.hospitals = best_hospitals
+
+    def seed_hospitals(self, num_of_hospitals, rng=random):
+        # k-means++ seeding under L1: the first house is drawn uniformly, every next one with probability
+        # proportional to its distance from the nearest house drawn so far
+        if len(self.houses) == 0:
+            return np.empty((0, 2), dtype=np.int64)
+        chosen = [rng.randrange(len(self.houses))]
+        distances = np.abs(self.houses - self.houses[chosen[0]]).sum(axis=1)
+        cumulative = np.cumsum(distances)
+        while len(chosen) < num_of_hospitals:
+            house = weighted_choice(cumulative, rng)
+            chosen.append(house)
+            distances = np.minimum(distances, np.abs(self.houses - self.houses[house]).sum(axis=1))
+            cumulative = np.cumsum(distances)
+        return self.houses[chosen].copy()
+
+    def free_cells(self, positions, clusters):
+        # Moves every position that lies on a house or on an earlier position to the free cell nearest to it,
+        # ties broken by the L1 cost of the houses of cluster i for position i
+        house_cells = self.house_cells()
+        taken = set()
+        positions = positions.copy()
+        for i, cell in enumerate(map(tuple, positions.tolist())):
+            radius = 0
+            while True:
+                ring = [cell] if radius == 0 else [
+                    (cell[0] + row_move, cell[1] + column_move)
+                    for row_move in range(-radius, radius + 1)
+                    for column_move in sorted({radius - abs(row_move), abs(row_move) - radius})]
+                ring = [candidate for candidate in ring if candidate not in house_cells and candidate not in taken]
+                if ring:
+                    break
+                radius += 1
+            if len(ring) > 1:
+                members = self.houses[clusters == i]
+                ring = [ring[int(manhattan_distances(members, np.array(ring, dtype=np.int64)).sum(axis=0).argmin())]]
+            positions[i] = ring[0]
+            taken.add(ring[0])
+        return positions
+
+    def random_hospitals(self, num_of_hospitals, rng=random):
+        # Distinct cells off the houses inside the bounding box of the houses, drawn by rng
+        house_cells = self.house_cells()
+        max_row, max_column = int(self.houses[:, 0].max()), int(self.houses[:, 1].max())
+        if (max_row + 1) * (max_column + 1) - len(house_cells) < num_of_hospitals:
+            raise Exception('Not enough free cells for the hospitals')
+        hospitals = []
+        hospital_cells = set()
+        while len(hospitals) < num_of_hospitals:
+            row = rng.randint(0, max_row)
+            column = rng.randint(0, max_column)
+            if (row, column) not in hospital_cells and (row, column) not in house_cells:
+                hospitals.append((row, column))
+                hospital_cells.add((row, column))
+        return np.array(hospitals, dtype=np.int64).reshape(-1, 2)
+
+    def restart(self, num_of_hospitals, seed):
+        # One hill climb from random hospitals on a copy of the space, self is left untouched
+        space = Space(self.max_bytes)
+        space.houses = self.houses
+        space.hospitals = space.random_hospitals(num_of_hospitals, random.Random(seed))
+        space.hill_climb()
+        return space.cost(), space.hospitals
+
+    def restart_results(self, num_of_hospitals, num_of_restarts, seed=None, max_workers=None, target_cost=None):
+        # Yields (restart, cost, hospitals) of every restart as soon as it finishes. Restart r starts from
+        # hospitals drawn by its own random.Random(seeds[r]), so with a seed the results do not depend on
+        # the number of workers or the order the restarts finish in. The seeds come from the global random
+        # without one. Once a restart reaches target_cost the restarts not started yet are cancelled.
+        rng = random if seed is None else random.Random(seed)
+        seeds = [rng.getrandbits(64) for _ in range(num_of_restarts)]
+
+        if max_workers == 1:
+            for restart, restart_seed in enumerate(seeds):
+                cost, hospitals = self.restart(num_of_hospitals, restart_seed)
+                yield restart, cost, hospitals
+                if target_cost is not None and cost <= target_cost:
+                    return
+            return
+
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_restart_worker,
+                                 initargs=(self.houses, self.max_bytes, num_of_hospitals)) as executor:
+            futures = {executor.submit(restart_worker, restart_seed): restart
+                       for restart, restart_seed in enumerate(seeds)}
+            pending = set(futures)
+            try:
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    reached = False
+                    for future in sorted(done, key=futures.get):
+                        cost, hospitals = future.result()
+                        yield futures[future], cost, hospitals
+                        reached = reached or (target_cost is not None and cost <= target_cost)
+                    if reached:
+                        return
+            finally:
+                # Also when the caller stops early, running restarts still finish and their results are dropped
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def random_restarts(self, num_of_hospitals, num_of_restarts, seed=None, max_workers=None, target_cost=None,
+                        verbose=False):
+        # Restarts run in a process pool, see restart_results. The best placement is the first one with
+        # the lowest cost in restart order, whatever order the restarts finished in. verbose prints the
+        # cost of every restart as it finishes.
+        opt_results = {}
+        for restart, cost, hospitals in self.restart_results(num_of_hospitals, num_of_restarts, seed=seed,
+                                                             max_workers=max_workers, target_cost=target_cost):
+            opt_results[restart] = (cost, hospitals)
+            if verbose:
+                print('Optimised to:', cost)
 
         min_cost = float('inf')
         min_hospitals_placement = None
-        for result in opt_results:
-            if result[0] < min_cost:
-                min_cost = result[0]
-                min_hospitals_placement = result[1]
+        for restart in sorted(opt_results):
+            if opt_results[restart][0] < min_cost:
+                min_cost = opt_results[restart][0]
+                min_hospitals_placement = opt_results[restart][1]
 
         self.hospitals = min_hospitals_placement
 
 
+# The space copy of the process running random restarts
+worker_state = {}
+
+
+def init_restart_worker(houses, max_bytes, num_of_hospitals):
+    space = Space(max_bytes)
+    space.houses = houses
+    worker_state.update(space=space, num_of_hospitals=num_of_hospitals)
+
+
+def restart_worker(seed):
+    return worker_state['space'].restart(worker_state['num_of_hospitals'], seed)
+
+
 if __name__ == '__main__':
     space = Space()
     space.add_house(1, 1)
@@ -141,6 +681,7 @@ if __name__ == '__main__':
     space.print_city()
     print('Initial Cost', space.cost())
     space.hill_climb(algo_type='steepest')
-    # space.random_restarts(2, 50)
+    # space.k_medians(2), then space.hill_climb() to polish it
+    # space.random_restarts(2, 50, verbose=True)
     print('Cost After Optimisation', space.cost())
     space.print_city()
@@ -0,0 +1,171 @@
+import csv
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from shortest_paths import GridMaze, Maze, distance_field
+
+WALL = ord('#')
+FREE = ord(' ')
+
+
+def generate_perfect_maze(rows, columns, rng):
+    # Randomised depth first backtracker on the odd cells, every pair of cells is joined by exactly one path
+    grid = np.full((rows, columns), WALL, dtype=np.uint8)
+    cell_rows = (rows - 1) // 2
+    cell_columns = (columns - 1) // 2
+    visited = bytearray(cell_rows * cell_columns)
+    carved = []  # (row, column) grid coordinates that become free
+
+    stack = [0]
+    visited[0] = 1
+    carved.append((1, 1))
+    while stack:
+        cell = stack[-1]
+        row, column = divmod(cell, cell_columns)
+        neighbours = []
+        if row > 0 and not visited[cell - cell_columns]:
+            neighbours.append(cell - cell_columns)
+        if row < cell_rows - 1 and not visited[cell + cell_columns]:
+            neighbours.append(cell + cell_columns)
+        if column > 0 and not visited[cell - 1]:
+            neighbours.append(cell - 1)
+        if column < cell_columns - 1 and not visited[cell + 1]:
+            neighbours.append(cell + 1)
+        if not neighbours:
+            stack.pop()
+            continue
+        neighbour = neighbours[int(rng.integers(len(neighbours)))]
+        visited[neighbour] = 1
+        neighbour_row, neighbour_column = divmod(neighbour, cell_columns)
+        # The wall between the two cells and the new cell itself
+        carved.append((row + neighbour_row + 1, column + neighbour_column + 1))
+        carved.append((2 * neighbour_row + 1, 2 * neighbour_column + 1))
+        stack.append(neighbour)
+
+    carved = np.array(carved)
+    grid[carved[:, 0], carved[:, 1]] = FREE
+    return grid
+
+
+def generate_room_maze(rows, columns, rng, room_size=8):
+    # Open rooms separated by single walls, every wall between two neighbouring rooms has one door
+    grid = np.full((rows, columns), FREE, dtype=np.uint8)
+    wall_rows = np.arange(0, rows, room_size + 1)
+    wall_columns = np.arange(0, columns, room_size + 1)
+    grid[wall_rows, :] = WALL
+    grid[:, wall_columns] = WALL
+    grid[-1, :] = WALL
+    grid[:, -1] = WALL
+
+    room_rows = wall_rows[:-1] + 1
+    room_columns = wall_columns[:-1] + 1
+    inner_wall_rows = wall_rows[1:][wall_rows[1:] < rows - 1]
+    inner_wall_columns = wall_columns[1:][wall_columns[1:] < columns - 1]
+    if len(inner_wall_rows) > 0 and len(room_columns) > 0:
+        doors = room_columns[None, :] + rng.integers(0, room_size, (len(inner_wall_rows), len(room_columns)))
+        doors = np.minimum(doors, columns - 2)
+        grid[np.repeat(inner_wall_rows, len(room_columns)), doors.ravel()] = FREE
+    if len(inner_wall_columns) > 0 and len(room_rows) > 0:
+        doors = room_rows[:, None] + rng.integers(0, room_size, (len(room_rows), len(inner_wall_columns)))
+        doors = np.minimum(doors, rows - 2)
+        grid[doors.ravel(), np.tile(inner_wall_columns, len(room_rows))] = FREE
+    return grid
+
+
+def generate_random_maze(rows, columns, rng, density=0.3):
+    # Independent random obstacles with the given density inside an outer wall
+    grid = np.where(rng.random((rows, columns)) < density, WALL, FREE).astype(np.uint8)
+    grid[[0, -1], :] = WALL
+    grid[:, [0, -1]] = WALL
+    return grid
+
+
+def generate_maze(file_path, num_of_cells, kind='perfect', seed=0, **kwargs):
+    # Writes a roughly square maze with num_of_cells cells in the format Maze and GridMaze read.
+    # A and B are the ends of a long shortest path inside the largest component, so the maze is always solvable.
+    rng = np.random.default_rng(seed)
+    side = max(int(round(num_of_cells ** 0.5)), 5)
+    rows, columns = side, side
+    if kind == 'perfect':
+        rows, columns = rows | 1, columns | 1  # odd sides keep the outer wall closed
+        grid = generate_perfect_maze(rows, columns, rng)
+    elif kind == 'rooms':
+        grid = generate_room_maze(rows, columns, rng, **kwargs)
+    elif kind == 'random':
+        grid = generate_random_maze(rows, columns, rng, **kwargs)
+    else:
+        raise Exception("Invalid maze kind")
+
+    free = grid != WALL
+    if not free.any():
+        grid[1, 1] = FREE
+        free = grid != WALL
+
+    # Find a component holding at least half of the free cells, then take two farthest sweeps inside it
+    free_cells = np.flatnonzero(free)
+    for candidate in rng.permutation(free_cells)[:16]:
+        distances = distance_field(free, [divmod(int(candidate), columns)])
+        if 2 * np.count_nonzero(distances >= 0) >= len(free_cells):
+            break
+    start = divmod(int(np.argmax(distances)), columns)
+    distances = distance_field(free, [start])
+    goal = divmod(int(np.argmax(distances)), columns)
+    grid[start] = ord('A')
+    if goal != start:
+        grid[goal] = ord('B')
+
+    lines = np.full((rows, columns + 1), ord('\n'), dtype=np.uint8)
+    lines[:, :-1] = grid
+    lines.tofile(file_path)
+    return file_path
+
+
+def run_benchmark(sizes=(10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7), kinds=('perfect', 'rooms', 'random'),
+                  algo_types=('dfs', 'bfs', 'gbfs', 'a*'), max_maze_cells=10 ** 5, seed=0, directory=None,
+                  results_path=None, trace_memory=True):
+    # Solves every generated maze with every algo type, by Maze up to max_maze_cells and by GridMaze
+    # at every size, and records time, expansions and peak memory of each solve. The times are of solves
+    # without tracemalloc, with trace_memory every maze is solved once more under it for the peak memory.
+    if directory is None:
+        directory = tempfile.mkdtemp(prefix='mazes_')
+    results = []
+    for num_of_cells in sizes:
+        for kind in kinds:
+            file_path = os.path.join(directory, kind + '_' + str(num_of_cells) + '.txt')
+            generate_maze(file_path, num_of_cells, kind=kind, seed=seed)
+            engines = [('GridMaze', GridMaze)]
+            if num_of_cells <= max_maze_cells:
+                engines.insert(0, ('Maze', Maze))
+            for engine_name, engine in engines:
+                for algo_type in algo_types:
+                    time_start = time.perf_counter()
+                    maze = engine(file_path, algo_type=algo_type)
+                    load_time = time.perf_counter() - time_start
+                    stats = maze.solve()
+                    if trace_memory:
+                        # tracemalloc slows the solve down by far, so the peak memory comes from a second,
+                        # traced solve and the times from the untraced one
+                        traced_maze = engine(file_path, algo_type=algo_type)
+                        stats.peak_memory = traced_maze.solve(trace_memory=True).peak_memory
+                    result = (kind, num_of_cells, engine_name, algo_type, len(maze.solution[0]) - 1,
+                              stats.expansions, stats.peak_frontier, stats.peak_memory, load_time, stats.wall_time)
+                    results.append(result)
+                    print(kind, num_of_cells, engine_name, algo_type, 'solution length:', result[4],
+                          'expansions:', stats.expansions, 'peak memory:', stats.peak_memory,
+                          'load:', round(load_time * 1000, 3), 'ms', 'solve:', round(stats.wall_time * 1000, 3), 'ms')
+
+    if results_path is not None:
+        with open(results_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['kind', 'cells', 'engine', 'algo_type', 'solution_length', 'expansions',
+                             'peak_frontier', 'peak_memory', 'load_time', 'solve_time'])
+            writer.writerows(results)
+    return results
+
+
+if __name__ == '__main__':
+    # The 10^6 and 10^7 sizes take minutes, start with the small ones
+    run_benchmark(sizes=(10 ** 2, 10 ** 3, 10 ** 4), results_path='maze_benchmark.csv')
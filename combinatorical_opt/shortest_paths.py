@@ -1,4 +1,15 @@
+import heapq
+import itertools
+import random
+import sys
 import time
+import tracemalloc
+from collections import OrderedDict, deque
+
+import numpy as np
+
+OPPOSITE_ACTIONS = {'u': 'd', 'd': 'u', 'l': 'r', 'r': 'l'}
+ACTION_OFFSETS = {'u': (-1, 0), 'd': (1, 0), 'l': (0, -1), 'r': (0, 1)}
 
 
 class Node:
@@ -18,6 +29,9 @@ class Node:
             return self.state == other.state
         return False
 
+    def __hash__(self):
+        return hash(self.state)
+
     def __str__(self):
         return "<Node: row=" + str(self.state[0]) + " col=" + str(self.state[1]) + ">"
 
@@ -27,19 +41,42 @@ class Node:
 
 class Frontier:
     def __init__(self):
-        self.frontier = []
+        self.frontier = deque()
+        # Number of frontier entries per state, gives O(1) contains_state
+        self.states = {}
+
+    def __iter__(self):
+        return iter(self.frontier)
+
+    def __len__(self):
+        return len(self.frontier)
+
+    def __repr__(self):
+        return str(list(self))
 
     def clear(self):
-        self.frontier = []
+        self.frontier = deque()
+        self.states = {}
 
     def push(self, node):
         self.frontier.append(node)
+        self._add_state(node.state)
+        return True
 
     def empty(self):
         return len(self.frontier) == 0
 
     def contains_state(self, state):
-        return any(node.state == state for node in self.frontier)
+        return state in self.states
+
+    def _add_state(self, state):
+        self.states[state] = self.states.get(state, 0) + 1
+
+    def _remove_state(self, state):
+        if self.states[state] == 1:
+            del self.states[state]
+        else:
+            self.states[state] -= 1
 
 
 class StackFrontier(Frontier):
@@ -49,7 +86,9 @@ class StackFrontier(Frontier):
     def pop(self):
         if self.empty():
             raise Exception("Frontier Empty")
-        return self.frontier.pop()
+        node = self.frontier.pop()
+        self._remove_state(node.state)
+        return node
 
 
 class QueueFrontier(Frontier):
@@ -59,35 +98,162 @@ class QueueFrontier(Frontier):
     def pop(self):
         if self.empty():
             raise Exception("Frontier Empty")
-        return self.frontier.pop(0)
+        node = self.frontier.popleft()
+        self._remove_state(node.state)
+        return node
 
 
-class PriorityQueueFrontier(QueueFrontier):
+class PriorityQueueFrontier(Frontier):
     def __init__(self, heuristic_function):
         super().__init__()
         self.heuristic_function = heuristic_function
+        # Entries are (priority, insertion order, node), the insertion order keeps
+        # nodes with equal priority in FIFO order and the nodes themselves uncompared
+        self.frontier = []
+        self.counter = itertools.count()
+
+    def __iter__(self):
+        return (entry[2] for entry in sorted(self.frontier))
+
+    def clear(self):
+        self.frontier = []
+        self.states = {}
+        self.counter = itertools.count()
 
     def push(self, node):
-        if node in self.frontier:
-            return
+        if self.contains_state(node.state):
+            return False
+        heapq.heappush(self.frontier, (self.heuristic_function(node), next(self.counter), node))
+        self._add_state(node.state)
+        return True
+
+    def pop(self):
         if self.empty():
-            self.frontier.append(node)
-        else:
-            for i in range(len(self.frontier)):
-                if self.heuristic_function(self.frontier[i]) > self.heuristic_function(node):
-                    self.frontier = self.frontier[:i] + [node] + self.frontier[i:]
-                    return
-                elif i == len(self.frontier) - 1:
-                    self.frontier.append(node)
+            raise Exception("Frontier Empty")
+        node = heapq.heappop(self.frontier)[2]
+        self._remove_state(node.state)
+        return node
+
+
+class SearchStats:
+    # Counters of one solve() call. duplicate_pushes counts the pushes that were suppressed because
+    # the state was already expanded or already waiting in the frontier, stale_pops the frontier
+    # entries dropped on pop. peak_memory (bytes) is only measured by solve(trace_memory=True).
+    def __init__(self):
+        self.expansions = 0
+        self.pushes = 0
+        self.duplicate_pushes = 0
+        self.stale_pops = 0
+        self.peak_frontier = 0
+        self.peak_memory = None
+        self.wall_time = 0.
+
+    def __str__(self):
+        return ("<SearchStats: expansions=" + str(self.expansions) + " pushes=" + str(self.pushes)
+                + " duplicate_pushes=" + str(self.duplicate_pushes) + " stale_pops=" + str(self.stale_pops)
+                + " peak_frontier=" + str(self.peak_frontier) + " peak_memory=" + str(self.peak_memory)
+                + " wall_time=" + str(self.wall_time) + ">")
+
+    def __repr__(self):
+        return self.__str__()
+
+    def record_frontier(self, size):
+        if size > self.peak_frontier:
+            self.peak_frontier = size
+
+
+def measure_solve(solver, trace_memory=False):
+    # Runs solver.calculate_solution() and fills solver.stats with the wall time and the peak memory
+    tracing = trace_memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    elif trace_memory:
+        tracemalloc.reset_peak()
+    time_start = time.perf_counter()
+    try:
+        solver.calculate_solution()
+    finally:
+        solver.stats.wall_time = time.perf_counter() - time_start
+        solver.solving_time = solver.stats.wall_time
+        if trace_memory:
+            solver.stats.peak_memory = tracemalloc.get_traced_memory()[1]
+        if tracing:
+            tracemalloc.stop()
+    return solver.stats
+
+
+def wavefront_distances(free, stride, sources, distance=None):
+    # Breadth first distances on a flat, wall padded grid, one whole frontier per step.
+    # free is a flat bool mask whose border cells are False, so the neighbours of a frontier
+    # are plain index shifts by -stride, +stride, -1 and +1 and need no bounds checks.
+    if distance is None:
+        distance = np.full(len(free), -1, dtype=np.int32)
+    offsets = np.array([-stride, stride, -1, 1], dtype=np.int64)
+
+    frontier = np.unique(np.asarray(sources, dtype=np.int64))
+    frontier = frontier[free[frontier]]
+    distance[frontier] = 0
+    step = 0
+    while len(frontier) > 0:
+        step += 1
+        neighbours = (frontier[:, None] + offsets).ravel()
+        neighbours = neighbours[free[neighbours]]
+        neighbours = neighbours[distance[neighbours] == -1]
+        frontier = np.unique(neighbours)
+        distance[frontier] = step
+    return distance
+
+
+def distance_field(free, sources):
+    # One-to-all (or nearest-of-many) step distances on a 2D bool mask of free cells,
+    # sources are (row, column) states. Walls and unreachable cells get -1.
+    free = np.asarray(free, dtype=bool)
+    padded = np.pad(free, 1, constant_values=False)
+    stride = padded.shape[1]
+    source_indices = [(row + 1) * stride + column + 1 for row, column in sources]
+    distance = wavefront_distances(padded.ravel(), stride, source_indices)
+    return distance.reshape(padded.shape)[1:-1, 1:-1]
+
+
+# Cell labels of exported images and their PPM colours / PGM grey levels
+IMAGE_FREE, IMAGE_WALL, IMAGE_EXPLORED, IMAGE_SOLUTION, IMAGE_START, IMAGE_GOAL = range(6)
+IMAGE_COLOURS = np.array([[255, 255, 255], [0, 0, 0], [160, 200, 255], [230, 40, 40], [40, 180, 40], [40, 40, 230]],
+                         dtype=np.uint8)
+IMAGE_GREYS = np.array([255, 0, 200, 110, 60, 60], dtype=np.uint8)
+
+
+def set_image_labels(labels, states, label):
+    if len(states) > 0:
+        rows, columns = np.array(states).T
+        labels[rows, columns] = label
+
+
+def save_image(file_path, labels, scale=1):
+    # Binary PPM (P6) for .ppm paths, binary PGM (P5) otherwise
+    if scale > 1:
+        labels = np.repeat(np.repeat(labels, scale, axis=0), scale, axis=1)
+    height, width = labels.shape
+    if file_path.endswith('.ppm'):
+        header, pixels = 'P6', IMAGE_COLOURS[labels]
+    else:
+        header, pixels = 'P5', IMAGE_GREYS[labels]
+    with open(file_path, 'wb') as f:
+        f.write((header + '\n' + str(width) + ' ' + str(height) + '\n255\n').encode('ascii'))
+        f.write(np.ascontiguousarray(pixels).tobytes())
 
 
 class Maze:
-    def __init__(self, file_path, algo_type='dfs'):
+    def __init__(self, file_path, algo_type='dfs', verbose=False, on_expand=None):
         self.maze = []
         self.solution = ([], [])
         self.frontier = None
         self.explored = []
         self.solving_time = 0.
+        self.algo_type = algo_type
+        self.stats = SearchStats()
+        # Printing is opt-in, on_expand(node, stats) is called for every expanded node
+        self.verbose = verbose
+        self.on_expand = on_expand
 
         with open(file_path, "r") as f:
             for line in f:
@@ -100,7 +266,8 @@ class Maze:
                 elif self.maze[row][column] == "B":
                     self.goal_node = Node((row, column), None, None)
 
-        self.print_maze()
+        if self.verbose:
+            self.print_maze()
 
         if algo_type == 'dfs':
             self.frontier = StackFrontier()
@@ -110,55 +277,113 @@ class Maze:
             self.frontier = PriorityQueueFrontier(self.manhattan_distance)
         elif algo_type == 'a*':
             self.frontier = PriorityQueueFrontier(self.a_star)
+        elif algo_type in ('bi-bfs', 'bi-a*', 'jps'):
+            # These searches keep their own open lists inside calculate_solution
+            self.frontier = None
         else:
             raise Exception("Invalid frontier type")
 
-    def print_maze(self, show_explored=False, show_manhattan=False, show_a_star=False):
+    def print_maze(self, show_explored=False, show_manhattan=False, show_a_star=False, show_distances=None):
+        # show_distances takes a field from distance_field and prints the real path distance of each cell
+        sys.stdout.write(self.render_maze(show_explored, show_manhattan, show_a_star, show_distances))
+
+    def render_maze(self, show_explored=False, show_manhattan=False, show_a_star=False, show_distances=None):
+        # Builds the whole frame in one pass, the explored and solution overlays are looked up in sets
+        explored_states = {node.state for node in self.explored} if show_explored else set()
+        solution_states = {node.state for node in self.solution[1]}
+        a_star_values = {}
+        if show_a_star:
+            for node in self.explored:
+                a_star_values.setdefault(node.state, self.a_star(node))
+
+        lines = []
         for row in range(len(self.maze)):
-            for column in range(len(self.maze[row])):
-                if self.maze[row][column] == "A":
-                    print("A", sep='', end='')
-                elif self.maze[row][column] == "B":
-                    print("B", sep='', end='')
-                elif self.maze[row][column] == "#":
-                    print('\u25A0', sep='', end='')
-                elif self.maze[row][column] == " " and show_a_star:
-                    for node in self.explored:
-                        if node.state == (row, column):
-                            print("|",
-                                  self.a_star(node),
-                                  "|",
-                                  sep='', end='')
-                            break
-                elif self.maze[row][column] == " " and show_manhattan:
-                    print("|",
-                          self.manhattan_distance(Node((row, column), None, None)),
-                          "|",
-                          sep='', end='')
-                elif show_explored and Node((row, column), None, None) in self.explored:
-                    print("e", sep='', end='')
-                elif Node((row, column), None, None) in self.solution[1]:
-                    print("*", sep='', end='')
-                elif self.maze[row][column] == " ":
-                    print(" ", sep='', end='')
-            print()
-
-    def solve(self):
-        time_start = time.time()
-        self.calculate_solution()
-        time_end = time.time()
-        self.solving_time = time_end - time_start
+            cells = []
+            for column, char in enumerate(self.maze[row]):
+                if char == "A" or char == "B":
+                    cells.append(char)
+                elif char == "#":
+                    cells.append('\u25A0')
+                elif char == " " and show_a_star:
+                    if (row, column) in a_star_values:
+                        cells.append("|" + str(a_star_values[(row, column)]) + "|")
+                elif char == " " and show_distances is not None:
+                    cells.append("|" + str(show_distances[row][column]) + "|")
+                elif char == " " and show_manhattan:
+                    cells.append("|" + str(self.manhattan_distance(Node((row, column), None, None))) + "|")
+                elif show_explored and (row, column) in explored_states:
+                    cells.append("e")
+                elif (row, column) in solution_states:
+                    cells.append("*")
+                elif char == " ":
+                    cells.append(" ")
+            cells.append("\n")
+            lines.append(''.join(cells))
+        return ''.join(lines)
+
+    def export_image(self, file_path, show_explored=False, scale=1):
+        # Writes the maze as a PPM (.ppm) or PGM (.pgm) image, one pixel block per cell
+        labels = np.full((len(self.maze), self.num_of_columns()), IMAGE_WALL, dtype=np.uint8)
+        labels[self.free_cells()] = IMAGE_FREE
+        if show_explored:
+            set_image_labels(labels, [node.state for node in self.explored], IMAGE_EXPLORED)
+        set_image_labels(labels, [node.state for node in self.solution[1]], IMAGE_SOLUTION)
+        set_image_labels(labels, [self.start_node.state], IMAGE_START)
+        set_image_labels(labels, [self.goal_node.state], IMAGE_GOAL)
+        save_image(file_path, labels, scale)
+
+    def solve(self, trace_memory=False):
+        self.stats = SearchStats()
+        measure_solve(self, trace_memory)
+        if self.verbose:
+            print(self.stats)
+        return self.stats
+
+    def expand(self, node):
+        self.explored.append(node)
+        self.stats.expansions += 1
+        if self.on_expand is not None:
+            self.on_expand(node, self.stats)
+
+    def num_of_columns(self):
+        # Longest row without its line break, the width GridMaze gives the same file
+        return max((len(line) - (line[-1:] == ['\n']) for line in self.maze), default=0)
+
+    def free_cells(self):
+        # Bool mask of the cells get_neighbour_nodes can step on, the line breaks are walls
+        columns = self.num_of_columns()
+        free = np.zeros((len(self.maze), columns), dtype=bool)
+        for row in range(len(self.maze)):
+            line = self.maze[row][:columns]
+            free[row, :len(line)] = [char not in '#\n' for char in line]
+        return free
+
+    def distance_field(self, sources=None):
+        # Distances from the start node, or from the nearest of several (row, column) sources
+        if sources is None:
+            sources = [self.start_node.state]
+        return distance_field(self.free_cells(), sources)
 
     def calculate_solution(self):
+        if self.algo_type == 'bi-bfs':
+            return self.calculate_bidirectional_bfs_solution()
+        elif self.algo_type == 'bi-a*':
+            return self.calculate_bidirectional_a_star_solution()
+        elif self.algo_type == 'jps':
+            return self.calculate_jps_solution()
+
         # The frontier and checked nodes data structures initialization
         self.frontier.clear()
         self.explored = []
+        explored_states = set()
 
         # Push the first node into the frontier, that being the start node of the maze
         self.frontier.push(self.start_node)
+        self.stats.pushes += 1
 
         num_of_actions = 0
-        print('Solving...')
+        if self.verbose:
+            print('Solving...')
         while True:
             # If the frontier is empty, there is no solution, raise Exception
             if self.frontier.empty():
@@ -166,67 +391,926 @@ class Maze:
 
             # Init the explored node as the node returned by the frontier pop method
             explored_node = self.frontier.pop()
+            # The same state can be pushed by several parents, only its first pop is expanded
+            if explored_node.state in explored_states:
+                self.stats.stale_pops += 1
+                continue
             num_of_actions += 1  # increment the number of actions
 
             # Append the explored node into the checked nodes
-            self.explored.append(explored_node)
+            self.expand(explored_node)
+            explored_states.add(explored_node.state)
 
             # If the explored node is the end node return the solution
             if explored_node == self.goal_node:
-                actions = []
-                nodes = []
-
-                loop_node = explored_node
-                while loop_node is not None:
-                    actions.append(loop_node.action)
-                    nodes.append(loop_node)
-
-                    loop_node = loop_node.parent
-                actions.reverse()
-                nodes.reverse()
-                self.solution = actions, nodes
-                print('frontier', self.frontier.frontier)
+                self.set_solution(explored_node)
+                if self.verbose:
+                    print('frontier', self.frontier)
                 return
 
             # Push Available Nodes of the explored Node into the frontier
-            if 0 != explored_node.state[0] and '#' != self.maze[explored_node.state[0] - 1][
-                explored_node.state[1]]:
-                # add the row-1 state
-                node = Node((explored_node.state[0] - 1, explored_node.state[1]), explored_node, 'u')
-                if node not in self.explored:
-                    self.frontier.push(node)
-
-            if len(self.maze) - 1 != explored_node.state[0] and '#' != self.maze[explored_node.state[0] + 1][
-                explored_node.state[1]]:
-                # add the row+1 state
-                node = Node((explored_node.state[0] + 1, explored_node.state[1]), explored_node, 'd')
-                if node not in self.explored:
-                    self.frontier.push(node)
-
-            if 0 != explored_node.state[1] and '#' != self.maze[explored_node.state[0]][
-                explored_node.state[1] - 1]:
-                # add the col-1 state
-                node = Node((explored_node.state[0], explored_node.state[1] - 1), explored_node, 'l')
-                if node not in self.explored:
-                    self.frontier.push(node)
-
-            if len(self.maze[0]) - 1 != explored_node.state[1] and '#' != self.maze[explored_node.state[0]][
-                explored_node.state[1] + 1]:
-                # add the col+1 state
-                node = Node((explored_node.state[0], explored_node.state[1] + 1), explored_node, 'r')
-                if node not in self.explored:
-                    self.frontier.push(node)
+            for node in self.get_neighbour_nodes(explored_node):
+                if node.state not in explored_states and self.frontier.push(node):
+                    self.stats.pushes += 1
+                else:
+                    self.stats.duplicate_pushes += 1
+            self.stats.record_frontier(len(self.frontier))
+
+    def calculate_bidirectional_bfs_solution(self):
+        # Both searches keep the nodes they reached, the search with the smaller layer
+        # expands it completely. The first layer that touches the other search holds
+        # the meeting point, the best one of that layer gives the shortest path.
+        self.explored = []
+        forward_reached = {self.start_node.state: self.start_node}
+        backward_reached = {self.goal_node.state: self.goal_node}
+        forward_layer = [self.start_node]
+        backward_layer = [self.goal_node]
+        self.stats.pushes += 2
+
+        if self.verbose:
+            print('Solving...')
+        if self.start_node == self.goal_node:
+            self.set_solution(self.start_node)
+            return
+
+        while forward_layer and backward_layer:
+            is_forward = len(forward_layer) <= len(backward_layer)
+            if is_forward:
+                layer, reached, other_reached = forward_layer, forward_reached, backward_reached
+            else:
+                layer, reached, other_reached = backward_layer, backward_reached, forward_reached
+
+            next_layer = []
+            meeting_state = None
+            meeting_cost = float('inf')
+            for explored_node in layer:
+                self.expand(explored_node)
+                for node in self.get_neighbour_nodes(explored_node):
+                    if node.state in reached:
+                        self.stats.duplicate_pushes += 1
+                        continue
+                    reached[node.state] = node
+                    next_layer.append(node)
+                    self.stats.pushes += 1
+                    if node.state in other_reached:
+                        cost = node.number_of_steps + other_reached[node.state].number_of_steps
+                        if cost < meeting_cost:
+                            meeting_cost = cost
+                            meeting_state = node.state
+
+            if meeting_state is not None:
+                self.set_bidirectional_solution(forward_reached[meeting_state], backward_reached[meeting_state])
+                return
+
+            if is_forward:
+                forward_layer = next_layer
+            else:
+                backward_layer = next_layer
+            self.stats.record_frontier(len(forward_layer) + len(backward_layer))
+
+        raise Exception("No Solution")
+
+    def calculate_bidirectional_a_star_solution(self):
+        # Forward A* towards B and backward A* towards A, both with consistent Manhattan
+        # heuristics. best_cost is the cheapest path through a state reached from both
+        # sides, it is optimal once the smaller f on either open list reaches it.
+        self.explored = []
+        counter = itertools.count()
+        forward = {
+            'best': {self.start_node.state: self.start_node},
+            'closed': set(),
+            'open': [(self.manhattan_distance(self.start_node), next(counter), self.start_node)],
+            'heuristic': self.manhattan_distance,
+        }
+        backward = {
+            'best': {self.goal_node.state: self.goal_node},
+            'closed': set(),
+            'open': [(self.manhattan_distance_to_start(self.goal_node), next(counter), self.goal_node)],
+            'heuristic': self.manhattan_distance_to_start,
+        }
+
+        best_cost = float('inf')
+        meeting_state = self.start_node.state if self.start_node == self.goal_node else None
+        if meeting_state is not None:
+            best_cost = 0
+        self.stats.pushes += 2
+
+        if self.verbose:
+            print('Solving...')
+        while forward['open'] and backward['open']:
+            if forward['open'][0][0] >= best_cost or backward['open'][0][0] >= best_cost:
+                break
+
+            if len(forward['open']) <= len(backward['open']):
+                search, other = forward, backward
+            else:
+                search, other = backward, forward
+
+            explored_node = heapq.heappop(search['open'])[2]
+            # Skip entries superseded by a cheaper path or already expanded
+            if explored_node.state in search['closed'] or search['best'][explored_node.state] is not explored_node:
+                self.stats.stale_pops += 1
+                continue
+            search['closed'].add(explored_node.state)
+            self.expand(explored_node)
+
+            for node in self.get_neighbour_nodes(explored_node):
+                known_node = search['best'].get(node.state)
+                if node.state in search['closed'] or \
+                        known_node is not None and node.number_of_steps >= known_node.number_of_steps:
+                    self.stats.duplicate_pushes += 1
+                    continue
+                search['best'][node.state] = node
+                heapq.heappush(search['open'], (node.number_of_steps + search['heuristic'](node), next(counter), node))
+                self.stats.pushes += 1
+                if node.state in other['best']:
+                    cost = node.number_of_steps + other['best'][node.state].number_of_steps
+                    if cost < best_cost:
+                        best_cost = cost
+                        meeting_state = node.state
+            self.stats.record_frontier(len(forward['open']) + len(backward['open']))
+
+        if meeting_state is None:
+            raise Exception("No Solution")
+        self.set_bidirectional_solution(forward['best'][meeting_state], backward['best'][meeting_state])
+
+    def calculate_jps_solution(self):
+        # Jump Point Search for the 4-connected grid. Vertical moves play the role diagonal
+        # moves have on 8-connected grids: every step of a vertical jump scans the row both
+        # ways, while horizontal jumps only stop at the goal or at forced vertical neighbours.
+        # Only jump points enter the open list, the path between them is a straight line.
+        self.explored = []
+        counter = itertools.count()
+        best = {self.start_node.state: self.start_node}
+        closed = set()
+        open_list = [(self.manhattan_distance(self.start_node), next(counter), self.start_node)]
+        self.stats.pushes += 1
+
+        if self.verbose:
+            print('Solving...')
+        while open_list:
+            explored_node = heapq.heappop(open_list)[2]
+            if explored_node.state in closed or best[explored_node.state] is not explored_node:
+                self.stats.stale_pops += 1
+                continue
+            closed.add(explored_node.state)
+            self.expand(explored_node)
+
+            if explored_node == self.goal_node:
+                self.set_jps_solution(explored_node)
+                return
+
+            for action in self.jps_directions(explored_node):
+                jump_state = self.jump(explored_node.state, action)
+                if jump_state is None:
+                    continue
+                node = Node(jump_state, explored_node, action)
+                node.number_of_steps = explored_node.number_of_steps + abs(jump_state[0] - explored_node.state[0]) \
+                    + abs(jump_state[1] - explored_node.state[1])
+                known_node = best.get(jump_state)
+                if jump_state in closed or known_node is not None and node.number_of_steps >= known_node.number_of_steps:
+                    self.stats.duplicate_pushes += 1
+                    continue
+                best[jump_state] = node
+                heapq.heappush(open_list, (self.a_star(node), next(counter), node))
+                self.stats.pushes += 1
+            self.stats.record_frontier(len(open_list))
+
+        raise Exception("No Solution")
+
+    def is_free(self, row, column):
+        return (0 <= row < len(self.maze) and 0 <= column < len(self.maze[0]) and column < len(self.maze[row])
+                and self.maze[row][column] != '#')
+
+    def jps_directions(self, node):
+        if node.action is None:
+            return ['u', 'd', 'l', 'r']
+        if node.action in ('u', 'd'):
+            return [node.action, 'l', 'r']
+
+        # Arrived horizontally: keep going, and turn only towards forced neighbours
+        row, column = node.state
+        back = column - ACTION_OFFSETS[node.action][1]
+        directions = [node.action]
+        if self.is_free(row - 1, column) and not self.is_free(row - 1, back):
+            directions.append('u')
+        if self.is_free(row + 1, column) and not self.is_free(row + 1, back):
+            directions.append('d')
+        return directions
+
+    def jump(self, state, action):
+        row_step, column_step = ACTION_OFFSETS[action]
+        row, column = state
+        while True:
+            row += row_step
+            column += column_step
+            if not self.is_free(row, column):
+                return None
+            if (row, column) == self.goal_node.state:
+                return row, column
+
+            if row_step == 0:
+                back = column - column_step
+                if (self.is_free(row - 1, column) and not self.is_free(row - 1, back)
+                        or self.is_free(row + 1, column) and not self.is_free(row + 1, back)):
+                    return row, column
+            elif self.jump((row, column), 'l') is not None or self.jump((row, column), 'r') is not None:
+                return row, column
+
+    def set_jps_solution(self, goal_node):
+        # Expand the straight segments between jump points back into single steps
+        jump_points = []
+        loop_node = goal_node
+        while loop_node is not None:
+            jump_points.append(loop_node)
+            loop_node = loop_node.parent
+        jump_points.reverse()
+
+        node = Node(jump_points[0].state, None, None)
+        for jump_point in jump_points[1:]:
+            row_step, column_step = ACTION_OFFSETS[jump_point.action]
+            while node.state != jump_point.state:
+                node = Node((node.state[0] + row_step, node.state[1] + column_step), node, jump_point.action)
+        self.set_solution(node)
+
+    def get_neighbour_nodes(self, node):
+        neighbours = []
+        row, column = node.state
+        if 0 != row and '#' != self.maze[row - 1][column]:
+            # add the row-1 state
+            neighbours.append(Node((row - 1, column), node, 'u'))
+        if len(self.maze) - 1 != row and '#' != self.maze[row + 1][column]:
+            # add the row+1 state
+            neighbours.append(Node((row + 1, column), node, 'd'))
+        if 0 != column and '#' != self.maze[row][column - 1]:
+            # add the col-1 state
+            neighbours.append(Node((row, column - 1), node, 'l'))
+        if len(self.maze[0]) - 1 != column and '#' != self.maze[row][column + 1]:
+            # add the col+1 state
+            neighbours.append(Node((row, column + 1), node, 'r'))
+        return neighbours
+
+    def set_solution(self, goal_node):
+        actions = []
+        nodes = []
+
+        loop_node = goal_node
+        while loop_node is not None:
+            actions.append(loop_node.action)
+            nodes.append(loop_node)
+
+            loop_node = loop_node.parent
+        actions.reverse()
+        nodes.reverse()
+        self.solution = actions, nodes
+
+    def set_bidirectional_solution(self, forward_node, backward_node):
+        # Walk the backward chain from the meeting point to B, re-rooting it on the forward chain
+        node = forward_node
+        loop_node = backward_node
+        while loop_node.parent is not None:
+            node = Node(loop_node.parent.state, node, OPPOSITE_ACTIONS[loop_node.action])
+            loop_node = loop_node.parent
+        self.set_solution(node)
 
     def manhattan_distance(self, node):
         return abs(self.goal_node.state[0] - node.state[0]) + abs(self.goal_node.state[1] - node.state[1])
 
+    def manhattan_distance_to_start(self, node):
+        return abs(self.start_node.state[0] - node.state[0]) + abs(self.start_node.state[1] - node.state[1])
+
     def a_star(self, node):
         return self.manhattan_distance(node) + node.number_of_steps
 
 
+class GridMaze:
+    # Compact alternative to Maze for very large mazes: the grid is a flat uint8 buffer of
+    # characters, cells are integer indices and the search state lives in preallocated arrays.
+    # The grid is padded with a wall row above and below and every row ends with a wall column,
+    # so the neighbours of a cell are at fixed offsets and never out of bounds.
+    WALL = ord('#')
+    NEWLINE = ord('\n')
+
+    def __init__(self, file_path, algo_type='dfs', on_expand=None):
+        if algo_type not in ('dfs', 'bfs', 'gbfs', 'a*'):
+            raise Exception("Invalid frontier type")
+        self.algo_type = algo_type
+        self.solution = ([], [])
+        self.explored = np.empty(0, dtype=np.int64)
+        self.solving_time = 0.
+        self.stats = SearchStats()
+        self.on_expand = on_expand  # called as on_expand(cell index, stats) for every expanded cell
+
+        self.grid, self.rows, self.stride = self.load_grid(file_path)
+        self.columns = self.stride - 1
+
+        # A and B are optional, a maze without them can still answer queries (see MazePathService)
+        start = np.flatnonzero(self.grid == ord('A'))
+        goal = np.flatnonzero(self.grid == ord('B'))
+        self.start = int(start[-1]) if len(start) > 0 else None
+        self.goal = int(goal[-1]) if len(goal) > 0 else None
+        self.start_state = self.cell_state(self.start) if self.start is not None else None
+        self.goal_state = self.cell_state(self.goal) if self.goal is not None else None
+
+        # Neighbour offsets in the same order as Maze expands them
+        self.offsets = ((-self.stride, 'u'), (self.stride, 'd'), (-1, 'l'), (1, 'r'))
+
+        # Search state, one entry per cell
+        index_type = np.int32 if len(self.grid) < 2 ** 31 else np.int64
+        self.parent = np.full(len(self.grid), -1, dtype=index_type)
+        self.distance = np.full(len(self.grid), -1, dtype=index_type)
+        self.status = np.zeros(len(self.grid), dtype=np.uint8)  # 0 unseen, 1 in frontier, 2 explored
+        self.order = np.empty(len(self.grid), dtype=index_type)  # expansion order / bfs queue
+
+    @staticmethod
+    def load_grid(file_path):
+        raw = np.memmap(file_path, dtype=np.uint8, mode='r')
+        line_ends = np.flatnonzero(raw == GridMaze.NEWLINE)
+        if len(raw) > 0 and raw[-1] != GridMaze.NEWLINE:
+            line_ends = np.append(line_ends, len(raw))
+        line_starts = np.concatenate(([0], line_ends[:-1] + 1))
+        lengths = line_ends - line_starts
+        rows = len(lengths)
+        stride = int(lengths.max()) + 1 if rows > 0 else 1
+
+        grid = np.full((rows + 2) * stride, GridMaze.WALL, dtype=np.uint8)
+        if rows > 0 and np.all(lengths == stride - 1):
+            # Rectangular file, the file bytes already have the grid layout
+            grid[stride:stride + len(raw)] = raw
+            grid[stride - 1 + (np.arange(1, rows + 1) * stride)] = GridMaze.WALL
+        else:
+            for row in range(rows):
+                begin = (row + 1) * stride
+                grid[begin:begin + lengths[row]] = raw[line_starts[row]:line_ends[row]]
+        del raw
+        return grid, rows, stride
+
+    def cell_index(self, state):
+        return (state[0] + 1) * self.stride + state[1]
+
+    def cell_state(self, index):
+        row, column = divmod(int(index), self.stride)
+        return row - 1, column
+
+    def manhattan_distance(self, index):
+        row, column = divmod(index, self.stride)
+        goal_row, goal_column = divmod(self.goal, self.stride)
+        return abs(goal_row - row) + abs(goal_column - column)
+
+    def export_image(self, file_path, show_explored=False, scale=1):
+        # Writes the maze as a PPM (.ppm) or PGM (.pgm) image, one pixel block per cell
+        grid = self.grid.reshape(self.rows + 2, self.stride)
+        labels = np.where(grid == self.WALL, IMAGE_WALL, IMAGE_FREE).astype(np.uint8)
+        flat_labels = labels.reshape(-1)
+        if show_explored:
+            flat_labels[self.explored] = IMAGE_EXPLORED
+        flat_labels[[self.cell_index(state) for state in self.solution[1]]] = IMAGE_SOLUTION
+        if self.start is not None:
+            flat_labels[self.start] = IMAGE_START
+        if self.goal is not None:
+            flat_labels[self.goal] = IMAGE_GOAL
+        save_image(file_path, labels[1:-1, :-1], scale)
+
+    def print_maze(self, show_explored=False, show_distances=None):
+        chars = self.grid.reshape(self.rows + 2, self.stride)[1:-1, :-1].view('S1').astype('U1')
+        if show_distances is not None:
+            empty = chars == ' '
+            chars = chars.astype(object)
+            chars[empty] = ['|' + str(distance) + '|' for distance in show_distances[empty]]
+        chars[chars == '#'] = '\u25A0'
+        view = chars.reshape(-1)
+        columns = self.columns
+
+        def mark(indices, char):
+            indices = np.asarray(indices, dtype=np.int64)
+            indices = indices[self.grid[indices] == ord(' ')]
+            if show_distances is not None:
+                return
+            rows, cols = np.divmod(indices, self.stride)
+            view[(rows - 1) * columns + cols] = char
+
+        mark([self.cell_index(state) for state in self.solution[1]], '*')
+        if show_explored:
+            mark(self.explored, 'e')
+        sys.stdout.write('\n'.join(''.join(row) for row in chars) + '\n')
+
+    def solve(self, trace_memory=False):
+        self.stats = SearchStats()
+        return measure_solve(self, trace_memory)
+
+    def is_free(self, index):
+        return self.grid[index] != self.WALL
+
+    def bfs_distances(self, sources):
+        # Number of steps from the nearest source cell index to every cell, -1 for walls and unreachable cells
+        distance = np.full(len(self.grid), -1, dtype=self.distance.dtype)
+        return wavefront_distances(self.grid != self.WALL, self.stride, sources, distance)
+
+    def distance_field(self, sources=None):
+        # Same as bfs_distances but takes (row, column) states and returns a (rows, columns) array
+        if sources is None:
+            sources = [self.start_state]
+        distance = self.bfs_distances([self.cell_index(state) for state in sources])
+        return distance.reshape(self.rows + 2, self.stride)[1:-1, :-1]
+
+    def calculate_solution(self):
+        if self.start is None or self.goal is None:
+            raise Exception("Maze has no start or goal")
+        self.parent.fill(-1)
+        self.distance.fill(-1)
+        self.status.fill(0)
+        self.solution = ([], [])
+
+        # memoryviews give fast scalar access from the Python loop
+        grid = memoryview(self.grid)
+        parent = memoryview(self.parent)
+        distance = memoryview(self.distance)
+        status = memoryview(self.status)
+        order = memoryview(self.order)
+        offsets = self.offsets
+        wall = self.WALL
+        goal = self.goal
+        algo_type = self.algo_type
+        stats = self.stats
+        on_expand = self.on_expand
+
+        distance[self.start] = 0
+        status[self.start] = 1
+        num_explored = 0
+        found = False
+        # Pushes are counted per branch, every other free neighbour is a suppressed duplicate push
+        pushes = 1
+        free_neighbours = 0
+        peak_frontier = 1
+
+        if algo_type == 'bfs':
+            # The explored cells are exactly the dequeued prefix of the queue
+            order[0] = self.start
+            tail = 1
+            while num_explored < tail:
+                cell = order[num_explored]
+                num_explored += 1
+                status[cell] = 2
+                if on_expand is not None:
+                    on_expand(cell, stats)
+                if cell == goal:
+                    found = True
+                    break
+                next_distance = distance[cell] + 1
+                for offset, _ in offsets:
+                    neighbour = cell + offset
+                    if grid[neighbour] != wall:
+                        free_neighbours += 1
+                        if status[neighbour] == 0:
+                            status[neighbour] = 1
+                            parent[neighbour] = cell
+                            distance[neighbour] = next_distance
+                            order[tail] = neighbour
+                            tail += 1
+                if tail - num_explored > peak_frontier:
+                    peak_frontier = tail - num_explored
+            pushes = tail
+        elif algo_type == 'dfs':
+            # A cell can be on the stack several times, the latest push sets its parent
+            stack = [self.start]
+            while stack:
+                cell = stack.pop()
+                if status[cell] == 2:
+                    stats.stale_pops += 1
+                    continue
+                status[cell] = 2
+                order[num_explored] = cell
+                num_explored += 1
+                if on_expand is not None:
+                    on_expand(cell, stats)
+                if cell == goal:
+                    found = True
+                    break
+                next_distance = distance[cell] + 1
+                for offset, _ in offsets:
+                    neighbour = cell + offset
+                    if grid[neighbour] != wall:
+                        free_neighbours += 1
+                        if status[neighbour] != 2:
+                            status[neighbour] = 1
+                            parent[neighbour] = cell
+                            distance[neighbour] = next_distance
+                            stack.append(neighbour)
+                            pushes += 1
+                if len(stack) > peak_frontier:
+                    peak_frontier = len(stack)
+        else:
+            # Heap keys pack (priority, push counter, cell) into one int, so equal
+            # priorities pop in FIFO order exactly as in PriorityQueueFrontier
+            cell_bits = len(self.grid).bit_length()
+            counter_bits = (4 * len(self.grid)).bit_length()
+            cell_mask = (1 << cell_bits) - 1
+            priority_shift = cell_bits + counter_bits
+            use_steps = algo_type == 'a*'
+            goal_row, goal_column = divmod(goal, self.stride)
+            stride = self.stride
+
+            heap = [self.start]
+            counter = 1
+            while heap:
+                cell = heapq.heappop(heap) & cell_mask
+                status[cell] = 2
+                order[num_explored] = cell
+                num_explored += 1
+                if on_expand is not None:
+                    on_expand(cell, stats)
+                if cell == goal:
+                    found = True
+                    break
+                next_distance = distance[cell] + 1
+                for offset, _ in offsets:
+                    neighbour = cell + offset
+                    if grid[neighbour] != wall:
+                        free_neighbours += 1
+                        if status[neighbour] == 0:
+                            status[neighbour] = 1
+                            parent[neighbour] = cell
+                            distance[neighbour] = next_distance
+                            row, column = divmod(neighbour, stride)
+                            priority = abs(goal_row - row) + abs(goal_column - column)
+                            if use_steps:
+                                priority += next_distance
+                            heapq.heappush(heap, (priority << priority_shift) | (counter << cell_bits) | neighbour)
+                            counter += 1
+                if len(heap) > peak_frontier:
+                    peak_frontier = len(heap)
+            pushes = counter
+
+        self.explored = self.order[:num_explored]
+        stats.expansions = num_explored
+        stats.pushes = pushes
+        stats.duplicate_pushes = free_neighbours - (pushes - 1)
+        stats.peak_frontier = peak_frontier
+        if not found:
+            raise Exception("No Solution")
+
+        actions = []
+        states = []
+        action_of_offset = dict(offsets)
+        cell = goal
+        while cell != -1:
+            previous = parent[cell]
+            actions.append(action_of_offset[cell - previous] if previous != -1 else None)
+            states.append(self.cell_state(cell))
+            cell = previous
+        actions.reverse()
+        states.reverse()
+        self.solution = actions, states
+
+
+class MazePathService:
+    # Answers many (start, goal) queries on one loaded GridMaze. Distances from a few landmarks are
+    # precomputed once, the triangle inequality |d(L, goal) - d(L, cell)| then gives an A* lower
+    # bound (ALT) that is much tighter than the Manhattan distance in walled mazes.
+    # Recent results are kept in an LRU cache, reversed queries are answered from it too.
+    def __init__(self, file_path, num_of_landmarks=8, cache_size=1024):
+        self.maze = GridMaze(file_path, algo_type='a*')
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.expanded_states = 0
+        self.queries_per_second = 0.
+
+        self.landmarks = []
+        self.landmark_distances = np.empty((0, len(self.maze.grid)), dtype=self.maze.distance.dtype)
+        self.select_landmarks(num_of_landmarks)
+
+        # Per query search state, only the touched cells are reset between queries
+        self.cost = np.full(len(self.maze.grid), -1, dtype=self.maze.distance.dtype)
+        self.closed = np.zeros(len(self.maze.grid), dtype=np.uint8)
+
+    def select_landmarks(self, num_of_landmarks):
+        # Farthest point selection: each new landmark is the free cell farthest from all landmarks
+        # chosen so far, cells no landmark reaches yet (other components) are picked first
+        free_cells = np.flatnonzero(self.maze.grid != GridMaze.WALL)
+        if len(free_cells) == 0:
+            return
+        tables = []
+        nearest = None
+        for _ in range(num_of_landmarks):
+            if nearest is None:
+                candidates = self.maze.bfs_distances([int(free_cells[0])])[free_cells]
+            else:
+                candidates = np.where(nearest[free_cells] == -1, np.iinfo(nearest.dtype).max, nearest[free_cells])
+                if candidates.max() == 0:
+                    break  # every free cell is already a landmark
+            landmark = int(free_cells[np.argmax(candidates)])
+            distances = self.maze.bfs_distances([landmark])
+            self.landmarks.append(landmark)
+            tables.append(distances)
+            if nearest is None:
+                nearest = distances.copy()
+            else:
+                nearest = np.where(nearest == -1, distances,
+                                   np.where(distances == -1, nearest, np.minimum(nearest, distances)))
+        if tables:
+            self.landmark_distances = np.array(tables)
+
+    def query(self, start, goal):
+        # Returns (path length, list of (row, column) states) or None when goal is unreachable
+        key = (start, goal)
+        if key in self.cache:
+            self.cache_hits += 1
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        if (goal, start) in self.cache:
+            self.cache_hits += 1
+            reverse_result = self.cache[(goal, start)]
+            result = None if reverse_result is None else (reverse_result[0], reverse_result[1][::-1])
+        else:
+            self.cache_misses += 1
+            result = self.calculate_path(self.maze.cell_index(start), self.maze.cell_index(goal))
+
+        self.cache[key] = result
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return result
+
+    def query_batch(self, queries):
+        time_start = time.perf_counter()
+        results = [self.query(start, goal) for start, goal in queries]
+        time_end = time.perf_counter()
+        self.queries_per_second = len(queries) / (time_end - time_start) if time_end > time_start else float('inf')
+        return results
+
+    def calculate_path(self, start, goal):
+        maze = self.maze
+        if not (0 <= start < len(maze.grid) and 0 <= goal < len(maze.grid)) \
+                or not maze.is_free(start) or not maze.is_free(goal):
+            raise Exception("Query cells must be free cells of the maze")
+
+        goal_distances = self.landmark_distances[:, goal].tolist()
+        start_distances = self.landmark_distances[:, start].tolist()
+        # A landmark reaching only one of the two cells proves they are in different components
+        if any((d_s == -1) != (d_g == -1) for d_s, d_g in zip(start_distances, goal_distances)):
+            return None
+        tables = [memoryview(table) for table in self.landmark_distances]
+        goal_row, goal_column = divmod(goal, maze.stride)
+        stride = maze.stride
+
+        def heuristic(cell):
+            row, column = divmod(cell, stride)
+            bound = abs(goal_row - row) + abs(goal_column - column)
+            for table, goal_distance in zip(tables, goal_distances):
+                difference = abs(goal_distance - table[cell])
+                if difference > bound:
+                    bound = difference
+            return bound
+
+        grid = memoryview(maze.grid)
+        parent = memoryview(maze.parent)
+        cost = memoryview(self.cost)
+        closed = memoryview(self.closed)
+        wall = GridMaze.WALL
+        offsets = [offset for offset, _ in maze.offsets]
+
+        touched = [start]
+        cost[start] = 0
+        parent[start] = -1
+        # Entries are (f, -g, cell), among equal f the deeper cell is expanded first
+        heap = [(heuristic(start), 0, start)]
+        found = False
+        while heap:
+            _, cell_cost, cell = heapq.heappop(heap)
+            cell_cost = -cell_cost
+            if closed[cell] or cell_cost != cost[cell]:
+                continue
+            closed[cell] = 1
+            self.expanded_states += 1
+            if cell == goal:
+                found = True
+                break
+            next_cost = cell_cost + 1
+            for offset in offsets:
+                neighbour = cell + offset
+                if grid[neighbour] == wall or closed[neighbour]:
+                    continue
+                if cost[neighbour] == -1 or next_cost < cost[neighbour]:
+                    if cost[neighbour] == -1:
+                        touched.append(neighbour)
+                    cost[neighbour] = next_cost
+                    parent[neighbour] = cell
+                    heapq.heappush(heap, (next_cost + heuristic(neighbour), -next_cost, neighbour))
+
+        result = None
+        if found:
+            states = []
+            cell = goal
+            while cell != -1:
+                states.append(maze.cell_state(cell))
+                cell = parent[cell]
+            states.reverse()
+            result = (cost[goal], states)
+
+        touched = np.array(touched, dtype=np.int64)
+        self.cost[touched] = -1
+        self.closed[touched] = 0
+        return result
+
+
+class DStarLiteMaze:
+    # Incremental replanner (D* Lite) on a GridMaze. The search runs backward from B, so after
+    # walls open or close only the states whose distance to B changed are expanded again.
+    # g is the distance the search settled on, rhs the one-step lookahead min(g(neighbour) + 1).
+    def __init__(self, file_path):
+        self.maze = GridMaze(file_path, algo_type='a*')
+        if self.maze.start is None or self.maze.goal is None:
+            raise Exception("Maze has no start or goal")
+        self.start = self.maze.start
+        self.goal = self.maze.goal
+        self.solution = ([], [])
+        self.explored = []
+        self.solving_time = 0.
+        self.stats = SearchStats()
+        # Counts the work since the last solve(), update_cells already pushes into the queue
+        self.repair_stats = SearchStats()
+
+        self.g = np.full(len(self.maze.grid), np.inf)
+        self.rhs = np.full(len(self.maze.grid), np.inf)
+        self.queue = []
+        self.queue_keys = {}  # cell -> key of its live queue entry, older heap entries are skipped
+        self.key_modifier = 0  # km, grows by h(last start, new start) when the start moves
+        self.last_start = self.start
+        self.offsets = [offset for offset, _ in self.maze.offsets]
+
+        self.rhs[self.goal] = 0
+        self.push(self.goal)
+
+    def heuristic(self, cell):
+        row, column = divmod(cell, self.maze.stride)
+        start_row, start_column = divmod(self.start, self.maze.stride)
+        return abs(start_row - row) + abs(start_column - column)
+
+    def calculate_key(self, cell):
+        best = min(self.g[cell], self.rhs[cell])
+        return best + self.heuristic(cell) + self.key_modifier, best
+
+    def push(self, cell):
+        key = self.calculate_key(cell)
+        self.queue_keys[cell] = key
+        heapq.heappush(self.queue, (key, cell))
+        self.repair_stats.pushes += 1
+
+    def top_key(self):
+        while self.queue:
+            key, cell = self.queue[0]
+            if self.queue_keys.get(cell) == key:
+                return key
+            heapq.heappop(self.queue)
+            self.repair_stats.stale_pops += 1
+        return np.inf, np.inf
+
+    def update_vertex(self, cell):
+        if cell != self.goal:
+            best = np.inf
+            if self.maze.is_free(cell):
+                for offset in self.offsets:
+                    neighbour = cell + offset
+                    if self.maze.is_free(neighbour) and self.g[neighbour] + 1 < best:
+                        best = self.g[neighbour] + 1
+            self.rhs[cell] = best
+        self.queue_keys.pop(cell, None)
+        if self.g[cell] != self.rhs[cell]:
+            self.push(cell)
+
+    def update_cells(self, changes):
+        # changes is a list of ((row, column), is_wall) events, the repair happens in the next solve()
+        for state, is_wall in changes:
+            if not 0 <= state[0] < self.maze.rows or not 0 <= state[1] < self.maze.columns:
+                raise Exception("Cell outside of the maze")
+            cell = self.maze.cell_index(state)
+            if is_wall and (cell == self.start or cell == self.goal):
+                raise Exception("A and B can not become walls")
+            self.maze.grid[cell] = GridMaze.WALL if is_wall else ord(' ')
+            if is_wall:
+                self.g[cell] = np.inf
+            self.update_vertex(cell)
+            for offset in self.offsets:
+                if self.maze.is_free(cell + offset):
+                    self.update_vertex(cell + offset)
+
+    def move_start(self, state):
+        cell = self.maze.cell_index(state)
+        if not self.maze.is_free(cell):
+            raise Exception("Start must be a free cell")
+        self.start = cell
+        self.key_modifier += self.heuristic(self.last_start)
+        self.last_start = cell
+
+    def solve(self, trace_memory=False):
+        self.stats = self.repair_stats
+        try:
+            return measure_solve(self, trace_memory)
+        finally:
+            self.repair_stats = SearchStats()
+
+    def calculate_solution(self):
+        self.explored = []
+        while self.top_key() < self.calculate_key(self.start) or self.rhs[self.start] != self.g[self.start]:
+            key_old, cell = heapq.heappop(self.queue)
+            del self.queue_keys[cell]
+            self.explored.append(self.maze.cell_state(cell))
+            self.repair_stats.expansions += 1
+            self.repair_stats.record_frontier(len(self.queue_keys) + 1)
+            key_new = self.calculate_key(cell)
+            if key_old < key_new:
+                self.push(cell)
+            elif self.g[cell] > self.rhs[cell]:
+                self.g[cell] = self.rhs[cell]
+                for offset in self.offsets:
+                    self.update_vertex(cell + offset)
+            else:
+                self.g[cell] = np.inf
+                self.update_vertex(cell)
+                for offset in self.offsets:
+                    self.update_vertex(cell + offset)
+
+        if self.g[self.start] == np.inf:
+            self.solution = ([], [])
+            raise Exception("No Solution")
+
+        # Follow the cheapest neighbour from A down to B
+        action_of_offset = dict(self.maze.offsets)
+        actions = [None]
+        states = [self.maze.cell_state(self.start)]
+        cell = self.start
+        while cell != self.goal:
+            next_cell = min((cell + offset for offset in self.offsets if self.maze.is_free(cell + offset)),
+                            key=lambda neighbour: self.g[neighbour])
+            actions.append(action_of_offset[next_cell - cell])
+            states.append(self.maze.cell_state(next_cell))
+            cell = next_cell
+        self.solution = actions, states
+
+
+def benchmark_replanning(file_path, num_of_edits=50, cells_per_edit=1, algo_type='a*', seed=0):
+    # Toggles random cells between wall and free and compares repairing the D* Lite tree
+    # with solving the edited maze from scratch by GridMaze
+    rng = random.Random(seed)
+    planner = DStarLiteMaze(file_path)
+    planner.solve()
+    full_maze = GridMaze(file_path, algo_type=algo_type)
+    full_maze.grid = planner.maze.grid  # both searches see the same edits
+
+    candidates = [cell for cell in range(planner.maze.stride, len(planner.maze.grid) - planner.maze.stride)
+                  if cell % planner.maze.stride != planner.maze.stride - 1
+                  and cell != planner.start and cell != planner.goal]
+    incremental_time = full_time = 0.
+    incremental_expansions = full_expansions = 0
+    edits = 0
+    for _ in range(num_of_edits):
+        changes = []
+        for cell in rng.sample(candidates, cells_per_edit):
+            changes.append((planner.maze.cell_state(cell), planner.maze.is_free(cell)))
+        planner.update_cells(changes)
+        try:
+            planner.solve()
+            incremental_solved = True
+        except Exception:
+            incremental_solved = False
+        try:
+            full_maze.solve()
+            full_solved = True
+        except Exception:
+            full_solved = False
+        if incremental_solved != full_solved:
+            raise Exception("Replanning and full solve disagree on reachability")
+        incremental_time += planner.solving_time
+        full_time += full_maze.solving_time
+        incremental_expansions += len(planner.explored)
+        full_expansions += len(full_maze.explored)
+        edits += 1
+
+    print('edits:', edits, 'cells per edit:', cells_per_edit)
+    print('D* Lite repair:', incremental_time * 1000, 'ms,', incremental_expansions / edits, 'expansions per edit')
+    print('full', algo_type, 're-solve:', full_time * 1000, 'ms,', full_expansions / edits, 'expansions per edit')
+    return incremental_time, full_time, incremental_expansions, full_expansions
+
+
+def compare_expansions(file_paths, algo_types=('dfs', 'bfs', 'gbfs', 'a*', 'bi-bfs', 'bi-a*', 'jps')):
+    # Solves every maze with every algo type and reports the solution length and the number of expanded states
+    results = []
+    for file_path in file_paths:
+        for algo_type in algo_types:
+            maze = Maze(file_path, algo_type=algo_type)
+            maze.solve()
+            results.append((file_path, algo_type, len(maze.solution[0]) - 1, len(maze.explored)))
+
+    for file_path, algo_type, solution_length, expansions in results:
+        print(file_path, algo_type, 'solution length:', solution_length, 'expanded states:', expansions)
+    return results
+
+
 if __name__ == "__main__":
-    maze = Maze("files/maze3.txt", algo_type='a*')
-    maze.solve()
+    maze = Maze("files/maze3.txt", algo_type='a*', verbose=True)
+    stats = maze.solve(trace_memory=True)
+    print('Search stats:', stats)
     print('Solution length:', len(maze.solution[0]) - 1)
     print('Explored states length:', len(maze.explored))
     print('Solving time:', maze.solving_time * 1000, 'ms')
@@ -238,3 +1322,14 @@ if __name__ == "__main__":
     # maze.print_maze(show_manhattan=True)
     # print('A* Visualisation:')
     # maze.print_maze(show_a_star=True)
+    # print('Path Distance Visualisation:')
+    # maze.print_maze(show_distances=maze.distance_field())
+    # maze.export_image('maze3.ppm', show_explored=True, scale=8)
+    # print('Expansions of the unidirectional and bidirectional searches:')
+    # compare_expansions(['files/maze1.txt', 'files/maze2.txt', 'files/maze3.txt'])
+    # print('Batch of path queries on one loaded maze:')
+    # service = MazePathService("files/maze3.txt")
+    # service.query_batch([((15, 0), (8, 13)), ((0, 3), (15, 0)), ((8, 13), (15, 0))])
+    # print('Queries per second:', service.queries_per_second, 'cache hits:', service.cache_hits)
+    # print('Replanning after random wall edits compared to full re-solves:')
+    # benchmark_replanning("files/maze3.txt", num_of_edits=50)
@@ -1,7 +1,18 @@
+import bisect
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
 import networkx as nx
 import matplotlib.pyplot as plt
+import numpy as np
+import heapq
 import random
 import time
+from collections import deque
+
+# Cap of one block of the Held-Karp minimum temporaries
+HELD_KARP_BLOCK_BYTES = 32 * 1024 ** 2
 
 
 def lexi_check(path):
@@ -13,12 +24,57 @@ def lexi_check(path):
     raise Exception('Something went wrong!')
 
 
+def cost_tolerance(cost):
+    # Float costs summed in a different order can differ in the last bits, costs this close count as ties
+    return 1e-9 * max(1., abs(cost)) if cost != float('inf') else 0.
+
+
 def fact(n):
     if n <= 1:
         return 1
     return n * fact(n - 1)
 
 
+def swap_permutations(length):
+    # Index orders in which the swap recursion of minimal_hamiltonian_path visits permutations of length items
+    orders = []
+
+    def permute(arr, l):
+        if l >= length - 1:
+            orders.append(arr)
+            return
+        for j in range(l, length):
+            arr[l], arr[j] = arr[j], arr[l]
+            permute(arr[:], l + 1)
+
+    permute(list(range(length)), 0)
+    return orders
+
+
+def minimum_spanning_tree(cost_row, k):
+    # Array based Prim over k nodes, cost_row(j) gives the costs from node j to all k nodes. Returns the cost
+    # and the parent of every tree node, node 0 is the root and its parent is -1
+    parents = np.full(k, -1)
+    if k <= 1:
+        return 0., parents
+    in_tree = np.zeros(k, dtype=bool)
+    in_tree[0] = True
+    best = np.array(cost_row(0), dtype=np.float64)
+    best_parents = np.zeros(k, dtype=np.intp)
+    total = 0.
+    for _ in range(k - 1):
+        best[in_tree] = np.inf
+        j = int(np.argmin(best))
+        total += best[j]
+        parents[j] = best_parents[j]
+        in_tree[j] = True
+        row = cost_row(j)
+        closer = row < best
+        best[closer] = row[closer]
+        best_parents[closer] = j
+    return total, parents
+
+
 class Node:
 
     def __init__(self, name):
@@ -43,11 +99,8 @@ class Node:
         return NotImplemented
 
     def add_edge(self, e):
-        for e_i in range(len(self.edges)):
-            if self.edges[e_i] > e:
-                self.edges = self.edges[:e_i] + [e] + self.edges[e_i:]
-                return
-        self.edges.append(e)
+        # Edges stay sorted by weight, an equal weight goes after the edges already there
+        bisect.insort(self.edges, e)
 
 
 class Edge:
@@ -81,6 +134,10 @@ class Graph:
         self.E = E
         self.best_hams = []
         self.best_hams_bb = []
+        self.best_hams_hk = []
+        self.best_tour = []
+        self.lower_bound = None
+        self.bound_cut_short = False
         self.states_explored = 0
         self.num_of_pruned = 0
 
@@ -88,6 +145,50 @@ class Graph:
             e.source.add_edge(e)
             e.target.add_edge(e)
 
+        self.build_cost_matrix()
+
+    def build_cost_matrix(self):
+        # cost_matrix[i, j] is the cheapest edge going from V[i] to V[j], inf when there is none.
+        # An edge that is not oriented is written in both directions.
+        n = len(self.V)
+        self.node_indices = {node: i for i, node in enumerate(self.V)}
+        self.cost_matrix = np.full((n, n), np.inf)
+        for e in self.E:
+            source = self.node_indices[e.source]
+            target = self.node_indices[e.target]
+            if e.weight < self.cost_matrix[source, target]:
+                self.cost_matrix[source, target] = e.weight
+            if not e.is_oriented and e.weight < self.cost_matrix[target, source]:
+                self.cost_matrix[target, source] = e.weight
+
+        # The cheapest edge touching every node, used by get_min_est
+        self.min_edge_weights = np.array([node.edges[0].weight if node.edges else np.inf for node in self.V],
+                                         dtype=np.float64)
+        # Spanning trees ignore direction, an undirected edge costs as much as the cheaper direction
+        self.undirected_costs = np.minimum(self.cost_matrix, self.cost_matrix.T)
+        np.fill_diagonal(self.undirected_costs, np.inf)
+
+    def costs_between(self, sources, targets):
+        # Costs of the edges from sources[i] to targets[i], both arrays of node indices
+        return self.cost_matrix[sources, targets]
+
+    def undirected_cost_rows(self, rows):
+        return self.undirected_costs[rows]
+
+    def cost_function(self):
+        # Cost of one edge between two node indices, the fastest way the graph can give a single cost
+        return self.cost_matrix.item
+
+    def is_symmetric(self):
+        return np.array_equal(self.cost_matrix, self.cost_matrix.T)
+
+    def is_complete(self):
+        n = len(self.V)
+        return bool(np.isfinite(self.undirected_costs[~np.eye(n, dtype=bool)]).all())
+
+    def get_indices(self, path):
+        return np.fromiter((self.node_indices[node] for node in path), dtype=np.intp, count=len(path))
+
     def paint_graph(self, only_hem=False, which_hem=0):
         G = nx.DiGraph()
 
@@ -151,47 +252,252 @@ class Graph:
 
     def get_min_est(self, path):
         # returns the minimal cost a path can achieve
-        cost = self.get_cost_of_sub_path(path)
-
-        for node in self.V:
-            if node not in path[:-1]:
-                cost += node.edges[0].weight
-
-        return cost
-
-    def mst_lower_bound(self, path):
-        cost = self.get_cost_of_sub_path(path)
-
-        subgraph_nodes = [path[0]]
-        if path[-1] not in subgraph_nodes:
-            subgraph_nodes.append(path[-1])
-
-        for node in self.V:
-            if node not in path:
-                subgraph_nodes.append(node)
-
-        def mst_cost(subgraph):
-            subG = nx.Graph()
-
-            for n in subgraph:
-                subG.add_node(n)
-
-            for e in self.E:
-                if e.source in subgraph and e.target in subgraph:
-                    subG.add_edge(e.source, e.target, weight=e.weight)
-
-            mst = nx.minimum_spanning_tree(subG, weight='weight')
-
-            return mst.size(weight='weight')
-
-        return cost + mst_cost(subgraph_nodes)
-
-    def branch_and_bound(self):
+        # cumsum adds in path order like the running cost of branch_and_bound, .sum() would add pairwise
+        indices = self.get_indices(path)
+        remaining = np.ones(len(self.V), dtype=bool)
+        remaining[indices[:-1]] = False
+        costs = np.concatenate((self.cost_matrix[indices[:-1], indices[1:]], self.min_edge_weights[remaining]))
+        return costs.cumsum()[-1].item() if len(costs) else 0
+
+    def mst_lower_bound(self, path, penalties=None):
+        # returns the minimal cost a path can achieve, the 1-tree like bound used by branch_and_bound
+        indices = self.get_indices(path)
+        remaining = np.ones(len(self.V), dtype=bool)
+        remaining[indices] = False
+        if penalties is None:
+            penalties = np.zeros(len(self.V))
+        cost = self.cost_matrix[indices[:-1], indices[1:]].sum()
+        return (cost + self.completion_bound(indices[-1], indices[0], np.flatnonzero(remaining), penalties)).item()
+
+    def subtree_lower_bound(self, cost, last, remaining_mask, parent_bound, penalties, tree_costs):
+        # Bound of a path from V[0] costing cost and ending in last, the unvisited nodes are the bits of
+        # remaining_mask. The tree over a set of unvisited nodes does not depend on the order they were
+        # left in, so tree_costs keeps it per set and shares it with every branch reaching that set.
+        if remaining_mask not in tree_costs:
+            remaining = np.flatnonzero((remaining_mask >> np.arange(len(self.V))) & 1)
+            tree_costs[remaining_mask] = (remaining, self.penalised_tree_cost(remaining, penalties))
+        remaining, tree_cost = tree_costs[remaining_mask]
+        estimate = cost + self.completion_bound(last, 0, remaining, penalties, tree_cost)
+        # Every completion of the child also completes the parent, so its bound holds here too
+        return max(estimate.item(), parent_bound)
+
+    def completion_bound(self, last, start, remaining, penalties, tree_cost=None):
+        # Lower bound on a path going from last through every node in remaining to start.
+        # The inner part of the path spans remaining, so it costs at least their MST, plus the cheapest
+        # edge leaving last and the cheapest edge entering start. With node penalties every edge i, j
+        # costs c_ij + p_i + p_j, which adds exactly 2 * p to every inner node and p_last + p_start
+        # to any such path, so subtracting those keeps the bound valid for any penalties.
+        if len(remaining) == 0:
+            return self.cost_matrix[last, start]
+        if tree_cost is None:
+            tree_cost = self.penalised_tree_cost(remaining, penalties)
+        leave = (self.cost_matrix[last, remaining] + penalties[remaining]).min() + penalties[last]
+        enter = (self.cost_matrix[remaining, start] + penalties[remaining]).min() + penalties[start]
+        return tree_cost + leave + enter - 2 * penalties[remaining].sum() - penalties[last] - penalties[start]
+
+    def penalised_tree_cost(self, indices, penalties):
+        costs = (self.undirected_costs[np.ix_(indices, indices)]
+                 + penalties[indices][:, None] + penalties[indices][None, :])
+        return minimum_spanning_tree(costs.__getitem__, len(indices))[0]
+
+    def lagrangian_penalties(self, max_iterations=100, step=2., upper_bound=None, deadline=None):
+        # Held-Karp subgradient ascent on 1-trees rooted in V[0]. A node of degree d in the 1-tree
+        # gets its penalty raised by step_size * (d - 2), so the trees are pushed towards tours.
+        # With a deadline (time.perf_counter() value) no iteration is started that would end after it,
+        # judged by the length of the previous one. Returns the penalties of the best bound found, the
+        # bound itself and whether the ascent finished rather than being stopped by the deadline.
+        n = len(self.V)
+        penalties = np.zeros(n)
+        if n < 3 or not self.is_complete():
+            return penalties, -np.inf, True
+        if upper_bound is None:
+            upper_bound = self.nearest_neighbour_cost()
+        others = np.arange(1, n)
+        best_penalties, best_bound = penalties.copy(), -np.inf
+        iterations_without_improvement = 0
+        iteration_time = 0.
+        for _ in range(max_iterations):
+            iteration_start = time.perf_counter()
+            if deadline is not None and iteration_start + iteration_time > deadline:
+                return best_penalties, best_bound, False
+            # The rows are made one at a time, so the graph never needs a dense matrix here
+            tree_cost, parents = minimum_spanning_tree(
+                lambda j: self.undirected_cost_rows(others[j:j + 1])[0][others] + penalties[others[j]]
+                + penalties[others], n - 1)
+            root_costs = self.undirected_cost_rows(np.array([0]))[0][others] + penalties[0] + penalties[others]
+            root_edges = np.argsort(root_costs, kind='stable')[:2]
+            bound = tree_cost + root_costs[root_edges].sum() - 2 * penalties.sum()
+
+            degrees = np.zeros(n)
+            np.add.at(degrees, others[parents[1:]], 1)
+            degrees[others[1:]] += 1
+            degrees[others[root_edges]] += 1
+            degrees[0] = 2
+
+            if bound > best_bound + 1e-12:
+                best_penalties, best_bound = penalties.copy(), bound
+                iterations_without_improvement = 0
+            else:
+                iterations_without_improvement += 1
+                if iterations_without_improvement >= 10:
+                    step /= 2
+                    iterations_without_improvement = 0
+            subgradient = degrees - 2
+            norm = (subgradient ** 2).sum()
+            if norm == 0 or step < 1e-6:
+                break
+            penalties = penalties + step * (upper_bound - bound) / norm * subgradient
+            iteration_time = time.perf_counter() - iteration_start
+        return best_penalties, best_bound, True
+
+    def nearest_neighbour_cost(self):
+        # Cost of the greedy nearest neighbour tour from V[0], an upper bound for the ascent step size
+        tour = self.nearest_neighbour_tour()
+        return self.costs_between(tour, np.roll(tour, -1)).sum()
+
+    def nearest_neighbour_tour(self):
+        # Node indices of the tour that always goes to the cheapest unvisited node, starting in V[0]
+        n = len(self.V)
+        visited = np.zeros(n, dtype=bool)
+        visited[0] = True
+        tour = [0]
+        for _ in range(n - 1):
+            candidates = np.where(visited, np.inf, self.costs_between(np.full(n, tour[-1]), np.arange(n)))
+            nearest = int(np.argmin(candidates))
+            visited[nearest] = True
+            tour.append(nearest)
+        return tour
+
+    def greedy_tour(self, candidates):
+        # Greedy edge construction: the candidate edges are taken from the cheapest while no node gets a third
+        # edge and no cycle closes, then the path fragments are chained from the nearest free end
+        n = len(self.V)
+        pairs = np.column_stack((np.repeat(np.arange(n), candidates.shape[1]), candidates.ravel()))
+        pairs = np.unique(np.sort(pairs, axis=1), axis=0)
+        order = np.argsort(self.costs_between(pairs[:, 0], pairs[:, 1]), kind='stable')
+
+        parents = list(range(n))
+
+        def find(node):
+            while parents[node] != node:
+                parents[node] = parents[parents[node]]
+                node = parents[node]
+            return node
+
+        degrees = [0] * n
+        adjacent = [[] for _ in range(n)]
+        for i, j in pairs[order].tolist():
+            if degrees[i] < 2 and degrees[j] < 2 and find(i) != find(j):
+                parents[find(i)] = find(j)
+                degrees[i] += 1
+                degrees[j] += 1
+                adjacent[i].append(j)
+                adjacent[j].append(i)
+
+        # Every fragment is a path, walk each one from a free end and jump to the nearest free end left
+        free_ends = np.array([degree < 2 for degree in degrees])
+        tour = []
+        current = int(np.flatnonzero(free_ends)[0])
+        while True:
+            previous = -1
+            while True:
+                free_ends[current] = False
+                tour.append(current)
+                following = [node for node in adjacent[current] if node != previous]
+                if not following:
+                    break
+                previous, current = current, following[0]
+            if len(tour) == n:
+                break
+            ends = np.flatnonzero(free_ends)
+            current = int(ends[np.argmin(self.costs_between(np.full(len(ends), current), ends))])
+        start = tour.index(0)
+        return tour[start:] + tour[:start]
+
+    def candidate_lists(self, k=8, block_size=1024):
+        # The k cheapest neighbours of every node ordered by cost, block_size rows of costs at a time
+        n = len(self.V)
+        k = min(k, n - 1)
+        candidates = np.empty((n, k), dtype=np.intp)
+        for first in range(0, n, block_size):
+            rows = np.arange(first, min(first + block_size, n))
+            costs = self.undirected_cost_rows(rows)
+            block = np.argpartition(costs, k - 1, axis=1)[:, :k]
+            block_costs = np.take_along_axis(costs, block, axis=1)
+            candidates[rows] = np.take_along_axis(block, np.argsort(block_costs, axis=1, kind='stable'), axis=1)
+        return candidates
+
+    def heuristic_tsp(self, construction='greedy', k=8, time_limit=10., moves=('2-opt', 'or-opt', 'lin-kernighan'),
+                      max_depth=5, bound_iterations=100, bound_share=0.2, seed=0):
+        # Heuristic for instances far beyond the exact solvers. The tour is built by nearest neighbour or
+        # greedy edge construction and improved by TourImprover. While time_limit (seconds) lasts, the local
+        # optimum is kicked by a double bridge move and improved again, the better tour is kept.
+        # The last bound_share of time_limit is left for the Held-Karp lower bound, every ascent iteration
+        # is an O(n^2) Prim, so on thousands of nodes only a few of them fit. The ascent stops at the
+        # deadline too and self.bound_cut_short tells whether it did, the gap is then measured to the
+        # weaker bound reached so far. Returns the cost, the tour starting in V[0] and its relative gap
+        # to the lower bound, None when not even one 1-tree fitted in the time.
+        n = len(self.V)
+        if n < 3:
+            raise Exception('Heuristic needs at least 3 nodes')
+        if not self.is_symmetric():
+            raise Exception('Heuristic needs a graph with symmetric costs')
+        deadline = time.perf_counter() + time_limit
+        search_deadline = deadline - (bound_share * time_limit if bound_iterations > 0 else 0.)
+        candidates = self.candidate_lists(k)
+        if construction == 'nearest-neighbour':
+            tour = self.nearest_neighbour_tour()
+        elif construction == 'greedy':
+            tour = self.greedy_tour(candidates)
+        else:
+            raise Exception('Invalid construction type')
+
+        improver = TourImprover(self.cost_function(), tour, candidates, moves, max_depth)
+        improver.optimise(search_deadline)
+        best_tour, best_cost = improver.tour[:], improver.tour_cost
+        rng = random.Random(seed)
+        while n >= 8 and time.perf_counter() < search_deadline:
+            improver.double_bridge(rng)
+            improver.optimise(search_deadline)
+            if improver.tour_cost < best_cost - 1e-10:
+                best_tour, best_cost = improver.tour[:], improver.tour_cost
+            else:
+                improver.set_tour(best_tour, best_cost)
+
+        start = best_tour.index(0)
+        self.best_tour = [self.V[i] for i in best_tour[start:] + best_tour[:start]]
+        best_cost = self.get_cost_of_path(self.best_tour)
+        _, lower_bound, finished = self.lagrangian_penalties(bound_iterations, upper_bound=best_cost,
+                                                             deadline=deadline)
+        self.lower_bound = float(lower_bound)
+        self.bound_cut_short = not finished
+        gap = None
+        if self.lower_bound > 0:
+            gap = max(0., (best_cost - self.lower_bound) / self.lower_bound)
+        return best_cost, self.best_tour, gap
+
+    def branch_and_bound(self, bound='lagrangian'):
+        # bound is 'min-est' (cheapest edge of every unvisited node), '1-tree' (MST of the unvisited
+        # nodes plus the edges joining it to the path) or 'lagrangian' (the 1-tree bound with
+        # Held-Karp penalties from a subgradient ascent at the root)
+        if bound not in ('min-est', '1-tree', 'lagrangian'):
+            raise Exception('Invalid bound type')
         min_cost = float('inf')
         starting_node = self.V[0]
         self.states_explored = 0
+        self.num_of_pruned = 0
+
+        penalties = np.zeros(len(self.V))
+        if bound == 'lagrangian':
+            penalties = self.lagrangian_penalties()[0]
+        tree_costs = {}
 
-        def branch(visited_nodes, cost=0, current_node=starting_node):
+        def is_promising(estimate):
+            # Costs are floats, a small tolerance keeps tours that tie with the best one
+            return estimate <= min_cost + cost_tolerance(min_cost)
+
+        def branch(visited_nodes, cost=0, current_node=starting_node,
+                   remaining_mask=(1 << len(self.V)) - 2, parent_bound=-float('inf')):
             # print('visited nodes', visited_nodes)
             nonlocal min_cost
             visited_nodes = visited_nodes[:]
@@ -203,10 +509,16 @@ class Graph:
 
                 # Here we can be checking if branching is pruned
                 # If the minimal cost of this path > minimal hamiltonian found so far -> then prune
-                if self.get_min_est(visited_nodes + [neighbour]) <= min_cost:
-                    branch((visited_nodes + [neighbour])[:],
-                           cost + self.get_cost_between_nodes(current_node, neighbour),
-                           neighbour)
+                neighbour_index = self.node_indices[neighbour]
+                neighbour_cost = cost + self.get_cost_between_nodes(current_node, neighbour)
+                neighbour_mask = remaining_mask & ~(1 << neighbour_index)
+                if bound == 'min-est':
+                    estimate = self.get_min_est(visited_nodes + [neighbour])
+                else:
+                    estimate = self.subtree_lower_bound(neighbour_cost, neighbour_index, neighbour_mask,
+                                                        parent_bound, penalties, tree_costs)
+                if is_promising(estimate):
+                    branch((visited_nodes + [neighbour])[:], neighbour_cost, neighbour, neighbour_mask, estimate)
                 else:
                     # print('pruning', visited_nodes + [neighbour])
                     if len(visited_nodes) <= len(self.V) - 2:
@@ -219,10 +531,10 @@ class Graph:
             if all(neighbour in visited_nodes for neighbour in neighbours):
                 self.states_explored += 1
                 cost += self.get_cost_between_nodes(visited_nodes[-1], starting_node)
-                if cost < min_cost:
+                if cost < min_cost - cost_tolerance(min_cost):
                     min_cost = cost
                     self.best_hams_bb.clear()
-                elif cost > min_cost:
+                elif cost > min_cost + cost_tolerance(min_cost):
                     return
                 if lexi_check(visited_nodes + [starting_node]):
                     self.best_hams_bb.append(visited_nodes)
@@ -232,60 +544,572 @@ class Graph:
 
         return self.best_hams_bb
 
-    def minimal_hamiltonian_path(self):
-        all_hams = []
-        starting_node = self.V[0]
-        other_nodes = self.V[1:]
+    def best_first_branch_and_bound(self, bound='lagrangian', max_nodes=None, max_seconds=None):
+        # Branch and bound without recursion. Open subproblems are (lower bound, cost, last node, visited
+        # bitmask) entries of a heap ordered by the bound, the cheapest bound is expanded first. Paths are
+        # kept as parent links. The nearest neighbour tour is the first incumbent, so stopping at max_nodes
+        # expanded subproblems or after max_seconds still returns a tour. The smallest bound left open proves
+        # how far the incumbent can be from the optimum.
+        # Returns the cost, the tour starting in V[0] and the relative gap, 0 when the tour is optimal.
+        if bound not in ('min-est', '1-tree', 'lagrangian'):
+            raise Exception('Invalid bound type')
+        n = len(self.V)
+        start_time = time.perf_counter()
+        self.states_explored = 0
+        self.num_of_pruned = 0
 
-        def permute(arr, l, r):
-            if l == r:
-                if lexi_check(arr):
-                    all_hams.append(arr)
-            else:
-                for j in range(l, r + 1):
-                    # Swap elements at index l and i
-                    arr[l], arr[j] = arr[j], arr[l]
+        penalties = np.zeros(n)
+        if bound == 'lagrangian':
+            penalties = self.lagrangian_penalties()[0]
+        tree_costs = {}
+        neighbour_indices = [[self.node_indices[node] for node in self.get_neighbour_nodes(v)] for v in self.V]
+
+        def lower_bound(path_ends, cost, last, remaining_mask, parent_bound):
+            if bound == 'min-est':
+                return self.get_min_est([self.V[i] for i in path_ends])
+            return self.subtree_lower_bound(cost, last, remaining_mask, parent_bound, penalties, tree_costs)
+
+        def get_path(entry):
+            path = []
+            while entry != -1:
+                path.append(lasts[entry])
+                entry = parents[entry]
+            return path[::-1]
+
+        best_path = self.nearest_neighbour_tour() if n > 1 else [0]
+        best_cost = self.cost_matrix[best_path, np.roll(best_path, -1)].sum().item()
+
+        # Parent link and last node of every subproblem ever pushed, the heap only holds their ids
+        parents, lasts = [-1], [0]
+        full_mask = (1 << n) - 1
+        root_bound = lower_bound([0], 0., 0, full_mask & ~1, -float('inf')) if n > 1 else best_cost
+        open_subproblems = [(root_bound, 0, 0., 0, 1)]  # the id breaks ties in the order of pushing
+        # The cheapest cost a (visited set, last node) state was reached with, worse duplicates are dropped
+        best_state_costs = {}
+        while open_subproblems:
+            if open_subproblems[0][0] > best_cost - 1e-9 * max(1., abs(best_cost)):
+                break
+            if (max_nodes is not None and self.states_explored >= max_nodes
+                    or max_seconds is not None and time.perf_counter() - start_time >= max_seconds):
+                break
+            estimate, entry, cost, last, visited_mask = heapq.heappop(open_subproblems)
+            if best_state_costs.get((visited_mask, last), float('inf')) < cost:
+                continue
+            self.states_explored += 1
+
+            if visited_mask == full_mask:
+                cost += self.cost_matrix[last, 0].item()
+                if cost < best_cost:
+                    best_cost, best_path = cost, get_path(entry)
+                continue
+
+            for neighbour in neighbour_indices[last]:
+                if (visited_mask >> neighbour) & 1:
+                    continue
+                neighbour_mask = visited_mask | (1 << neighbour)
+                neighbour_cost = cost + self.cost_matrix[last, neighbour].item()
+                if best_state_costs.get((neighbour_mask, neighbour), float('inf')) <= neighbour_cost:
+                    self.num_of_pruned += 1
+                    continue
+                neighbour_estimate = lower_bound(get_path(entry) + [neighbour] if bound == 'min-est' else None,
+                                                 neighbour_cost, neighbour, full_mask & ~neighbour_mask, estimate)
+                if neighbour_estimate >= best_cost:
+                    self.num_of_pruned += 1
+                    continue
+                best_state_costs[(neighbour_mask, neighbour)] = neighbour_cost
+                parents.append(entry)
+                lasts.append(neighbour)
+                heapq.heappush(open_subproblems, (neighbour_estimate, len(lasts) - 1, neighbour_cost, neighbour,
+                                                  neighbour_mask))
+
+        if best_cost == float('inf'):
+            return None, None, None
+        # Every tour better than the incumbent passes through an open subproblem
+        proven_bound = min(open_subproblems[0][0], best_cost) if open_subproblems else best_cost
+        self.lower_bound = proven_bound
+        self.best_tour = [self.V[i] for i in best_path]
+        if best_cost - proven_bound <= 1e-9 * max(1., abs(best_cost)):
+            gap = 0.
+        elif proven_bound > 0:
+            gap = (best_cost - proven_bound) / proven_bound
+        else:
+            gap = float('inf')
+        return best_cost, self.best_tour, gap
+
+    def parallel_branch_and_bound(self, split_depth=2, max_workers=None, bound='lagrangian'):
+        # Splits the search tree into the paths of split_depth nodes after V[0] and solves every one of
+        # them in a process pool. The best cost found by any worker is kept in shared memory and every
+        # worker prunes against it. Subtree results are merged in the order branch_and_bound visits
+        # them, so best_hams_bb holds the same tours in the same order.
+        if bound not in ('min-est', '1-tree', 'lagrangian'):
+            raise Exception('Invalid bound type')
+        n = len(self.V)
+        self.states_explored = 0
+        self.num_of_pruned = 0
+        self.best_hams_bb = []
 
-                    # Recurse for the next position
-                    permute(arr[:], l + 1, r)
+        penalties = np.zeros(n)
+        if bound == 'lagrangian':
+            penalties = self.lagrangian_penalties()[0]
+        # Any tour is an upper bound, so the greedy one lets the workers prune from the start
+        incumbent = multiprocessing.Value('d', self.nearest_neighbour_cost() if n > 1 else float('inf'))
+
+        prefixes = [([0], 0)]
+        for _ in range(min(split_depth, n - 1)):
+            next_prefixes = []
+            for prefix, cost in prefixes:
+                neighbours = [self.node_indices[node] for node in self.get_neighbour_nodes(self.V[prefix[-1]])]
+                children = [(prefix + [neighbour], cost + self.cost_matrix[prefix[-1], neighbour].item())
+                            for neighbour in neighbours if neighbour not in prefix]
+                # A dead end is still a leaf, it is solved as it is
+                next_prefixes.extend(children if children else [(prefix, cost)])
+            prefixes = next_prefixes
+
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_parallel_worker,
+                                 initargs=(self, bound, penalties, incumbent)) as executor:
+            results = list(executor.map(branch_and_bound_worker, prefixes))
+
+        min_cost = min((result[0] for result in results), default=float('inf'))
+        for cost, hams, states_explored, num_of_pruned in results:
+            self.states_explored += states_explored
+            self.num_of_pruned += num_of_pruned
+            if cost <= min_cost + cost_tolerance(min_cost):
+                self.best_hams_bb.extend([self.V[i] for i in ham] for ham in hams)
+        return self.best_hams_bb
 
-        permute(other_nodes, 0, len(other_nodes) - 1)
+    def branch_subtree(self, prefix, prefix_cost, bound, penalties, incumbent, tree_costs):
+        # The search of branch_and_bound below a fixed path of node indices, pruning against the shared
+        # incumbent. Returns the best cost in the subtree, its tours as node indices and the counters.
+        n = len(self.V)
+        names = [str(node) for node in self.V]
+        neighbour_indices = [[self.node_indices[node] for node in self.get_neighbour_nodes(v)] for v in self.V]
+        best_cost = float('inf')
+        hams = []
+        states_explored, num_of_pruned = 0, 0
+
+        def is_promising(estimate):
+            min_cost = min(best_cost, incumbent.value)
+            return estimate <= min_cost + cost_tolerance(min_cost)
+
+        def branch(path, cost, remaining_mask, parent_bound):
+            nonlocal best_cost, states_explored, num_of_pruned
+            neighbours = neighbour_indices[path[-1]]
+            for neighbour in neighbours:
+                if not (remaining_mask >> neighbour) & 1:
+                    continue
 
-        # Handling cycles in permutations
-        for i in range(len(all_hams)):
-            all_hams[i] = [starting_node] + all_hams[i]
+                neighbour_cost = cost + self.cost_matrix[path[-1], neighbour].item()
+                neighbour_mask = remaining_mask & ~(1 << neighbour)
+                if bound == 'min-est':
+                    estimate = self.get_min_est([self.V[i] for i in path + [neighbour]])
+                else:
+                    estimate = self.subtree_lower_bound(neighbour_cost, neighbour, neighbour_mask,
+                                                        parent_bound, penalties, tree_costs)
+                if is_promising(estimate):
+                    branch(path + [neighbour], neighbour_cost, neighbour_mask, estimate)
+                elif len(path) <= n - 2:
+                    num_of_pruned += 1
+                else:
+                    states_explored += 1
+
+            if all(not (remaining_mask >> neighbour) & 1 for neighbour in neighbours):
+                states_explored += 1
+                cost += self.cost_matrix[path[-1], 0].item()
+                if cost < best_cost - cost_tolerance(best_cost):
+                    best_cost = cost
+                    hams.clear()
+                    with incumbent.get_lock():
+                        if cost < incumbent.value:
+                            incumbent.value = cost
+                elif cost > best_cost + cost_tolerance(best_cost):
+                    return
+                if lexi_check([names[i] for i in path] + [names[0]]):
+                    hams.append(path)
+
+        remaining_mask = (1 << n) - 1
+        for i in prefix:
+            remaining_mask &= ~(1 << i)
+        branch(prefix, prefix_cost, remaining_mask, -float('inf'))
+        return best_cost, hams, states_explored, num_of_pruned
 
+    def minimal_hamiltonian_path(self, suffix_length=6):
+        starting_node = self.V[0]
         min_cost = float('inf')
-        for path in all_hams:
-            cost = self.get_cost_of_path(path)
-            if cost < min_cost:
-                min_cost = cost
+        for costs, orders in self.hamiltonian_cycle_batches(lambda: min_cost, suffix_length):
+            if len(costs) == 0:
+                continue
+            batch_min = costs.min().item()
+            if batch_min < min_cost - cost_tolerance(min_cost):
+                min_cost = batch_min
                 self.best_hams.clear()
-                self.best_hams.append(path)
-            elif cost == min_cost:
-                self.best_hams.append(path)
+            if batch_min <= min_cost + cost_tolerance(min_cost):
+                for order in orders[costs <= min_cost + cost_tolerance(min_cost)].tolist():
+                    self.best_hams.append([starting_node] + [self.V[i] for i in order])
 
         if min_cost == float('inf'):
             return None, None
         return min_cost, self.best_hams
 
+    def hamiltonian_cycle_batches(self, incumbent=lambda: float('inf'), suffix_length=6):
+        # Generates every cycle from V[0] through a permutation of the other nodes that lexi_check keeps,
+        # as (costs, orders) batches where orders holds the node indices after V[0]. The permutations come
+        # in the order of the swap recursion brute force always used, made in place on one list.
+        # Prefix costs are carried down the recursion and the last suffix_length positions are costed
+        # together in NumPy. A prefix costing more than incumbent() is skipped when no cost is negative.
+        n = len(self.V)
+        if n < 2:
+            return
+        arr = list(range(1, n))
+        r = n - 2
+        suffix_length = max(1, min(suffix_length, r + 1))
+        suffix_orders = np.array(swap_permutations(suffix_length), dtype=np.intp)
+        names = [str(node) for node in self.V]
+        name_ranks = {name: rank for rank, name in enumerate(sorted(set(names)))}
+        ranks = np.array([name_ranks[name] for name in names])
+        can_prune = bool((self.cost_matrix >= 0).all())
+        cost = self.cost_matrix.item
+
+        def cost_batch(l, prefix_cost, last):
+            suffixes = np.array(arr[l:])[suffix_orders]
+            # Added one edge at a time, so float costs come out exactly as a sum along the path
+            costs = prefix_cost + self.cost_matrix[last, suffixes[:, 0]]
+            for i in range(suffix_length - 1):
+                costs = costs + self.cost_matrix[suffixes[:, i], suffixes[:, i + 1]]
+            costs = costs + self.cost_matrix[suffixes[:, -1], 0]
+
+            orders = np.hstack((np.broadcast_to(np.array(arr[:l], dtype=np.intp), (len(suffixes), l)), suffixes))
+            # lexi_check on every row at once, the first differing pair from both ends decides
+            order_ranks = ranks[orders]
+            half = orders.shape[1] // 2
+            left, right = order_ranks[:, :half], order_ranks[:, ::-1][:, :half]
+            differ = left != right
+            if not differ.any(axis=1).all():
+                raise Exception('Something went wrong!')
+            first = differ.argmax(axis=1)
+            rows = np.arange(len(orders))
+            keep = left[rows, first] < right[rows, first]
+            return costs[keep], orders[keep]
+
+        def permute(l, prefix_cost, last):
+            if r + 1 - l == suffix_length:
+                yield cost_batch(l, prefix_cost, last)
+                return
+            for j in range(l, r + 1):
+                # Swap elements at index l and j, the swaps pile up like on the copies the recursion used to make
+                arr[l], arr[j] = arr[j], arr[l]
+                arr_cost = prefix_cost + cost(last, arr[l])
+                if can_prune and arr_cost > incumbent() + cost_tolerance(incumbent()):
+                    continue
+                yield from permute(l + 1, arr_cost, arr[l])
+            for j in range(r, l - 1, -1):
+                arr[l], arr[j] = arr[j], arr[l]
+
+        yield from permute(0, 0, 0)
+
+    def held_karp(self, all_optimal=True, dtype=None, max_memory=2 * 1024 ** 3):
+        # Exact dynamic programming over (subset of visited nodes, last node), O(2^n * n^2) time.
+        # dp[mask, j] is the cheapest path from V[0] through the nodes in mask ending in node j + 1,
+        # bit j of mask stands for V[j + 1]. The table is filled one subset size at a time.
+        # Besides the table it needs about 2^(n-1) bytes and HELD_KARP_BLOCK_BYTES of temporaries, all counted
+        # against max_memory. Without a dtype the table is float32 when the costs are integers and no tour can reach 2^24,
+        # where float32 still adds them exactly, and float64 otherwise.
+        n = len(self.V)
+        self.best_hams_hk = []
+        if n < 2:
+            return None, None
+        costs = self.cost_matrix
+        if dtype is None:
+            finite = np.abs(costs[np.isfinite(costs)])
+            exact = finite.size == 0 or (np.all(finite == np.round(finite)) and finite.max() * n < 2 ** 24)
+            dtype = np.float32 if exact else np.float64
+        costs = costs.astype(dtype)
+        np.fill_diagonal(costs, np.inf)
+
+        m = n - 1
+        # The table, one popcount byte per subset, the largest layer of subsets with its index arrays and two
+        # (block rows, m) temporaries of the minimum
+        itemsize = np.dtype(dtype).itemsize
+        block_rows = max(1, HELD_KARP_BLOCK_BYTES // (m * itemsize))
+        largest_layer = math.comb(m, m // 2)
+        needed = ((1 << m) * m * itemsize + (1 << m) + 3 * 8 * largest_layer
+                  + 2 * min(block_rows, largest_layer) * m * itemsize)
+        if needed > max_memory:
+            raise Exception('Held-Karp needs ' + str(needed) + ' bytes, more than max_memory')
+
+        dp = np.full((1 << m, m), np.inf, dtype=dtype)
+        singles = 1 << np.arange(m)
+        dp[singles, np.arange(m)] = costs[0, 1:]
+
+        # Popcounts are made a block of masks at a time, so no 2^m array of int64 masks is needed
+        popcounts = np.zeros(1 << m, dtype=np.int8)
+        for first in range(0, 1 << m, 1 << 20):
+            masks = np.arange(first, min(first + (1 << 20), 1 << m))
+            for bit in range(m):
+                popcounts[first:first + len(masks)] += ((masks >> bit) & 1).astype(np.int8)
+
+        inner_costs = costs[1:, 1:]
+        for size in range(2, m + 1):
+            layer = np.flatnonzero(popcounts == size)
+            for j in range(m):
+                subsets = layer[(layer >> j) & 1 == 1]
+                for first in range(0, len(subsets), block_rows):
+                    block = subsets[first:first + block_rows]
+                    dp[block, j] = np.min(dp[block ^ (1 << j)] + inner_costs[:, j], axis=1)
+
+        full = (1 << m) - 1
+        tour_costs = dp[full] + costs[1:, 0]
+        min_cost = tour_costs.min()
+        if min_cost == float('inf'):
+            return None, None
+        tolerance = 1e-9 * max(1., abs(float(min_cost)))
+
+        # Walk back through every predecessor that attains the optimum
+        tours = []
+
+        def collect(mask, last, suffix):
+            if mask == 1 << last:
+                tours.append([0, last + 1] + suffix)
+                return
+            previous = mask ^ (1 << last)
+            candidates = np.flatnonzero(np.abs(dp[previous] + inner_costs[:, last] - dp[mask, last]) <= tolerance)
+            for node in candidates:
+                collect(previous, int(node), [last + 1] + suffix)
+                if tours and not all_optimal:
+                    return
+
+        for last in np.flatnonzero(np.abs(tour_costs - min_cost) <= tolerance):
+            collect(full, int(last), [])
+            if tours and not all_optimal:
+                break
+
+        # Keep one direction of every cycle, the same way minimal_hamiltonian_path does. The reverse of a tour
+        # only costs the same with symmetric costs, otherwise both directions are different tours.
+        symmetric = self.is_symmetric()
+        for tour in tours:
+            path = [self.V[i] for i in tour]
+            if n == 2 or not symmetric or lexi_check(path[1:]) or not all_optimal:
+                self.best_hams_hk.append(path)
+        return min_cost.item(), self.best_hams_hk
+
     def get_cost_of_sub_path(self, sub_path):
-        cost = 0
-        for node in range(len(sub_path) - 1):
-            cost += self.get_cost_between_nodes(sub_path[node], sub_path[node + 1])
-        return cost
+        indices = self.get_indices(sub_path)
+        costs = self.costs_between(indices[:-1], indices[1:])
+        return costs.cumsum()[-1].item() if len(costs) else 0
 
     def get_cost_of_path(self, path):
-        cost = 0
-        for node in range(len(path)):
-            cost += self.get_cost_between_nodes(path[node], path[(node + 1) % len(path)])
-        return cost
+        indices = self.get_indices(path)
+        # Added in path order, the way branch_and_bound accumulates the cost of a tour
+        return self.costs_between(indices, np.roll(indices, -1)).cumsum()[-1].item()
 
     def get_cost_between_nodes(self, node_1, node_2):
-        for e in node_1.edges:
-            if e.source == node_1 and e.target == node_2 or e.source == node_2 and e.target == node_1 and not e.is_oriented:
-                return e.weight
-        return float('inf')
+        return self.cost_function()(self.node_indices[node_1], self.node_indices[node_2])
+
+
+class TourImprover:
+    # Local search on a tour of node indices. The tour is a list plus the position of every node in it.
+    # Moves only look at the k nearest neighbours (candidates) of a node, and a node is searched again
+    # only after one of its tour edges changed (don't-look bits). cost(i, j) must be symmetric.
+
+    def __init__(self, cost, tour, candidates, moves=('2-opt', 'or-opt', 'lin-kernighan'), max_depth=5):
+        for move in moves:
+            if move not in ('2-opt', 'or-opt', 'lin-kernighan'):
+                raise Exception('Invalid move type')
+        self.cost = cost
+        self.n = len(tour)
+        self.candidates = [list(row) for row in candidates]
+        self.moves = moves
+        self.max_depth = max_depth
+        self.improving_moves = 0
+        self.tour, self.pos, self.tour_cost = [], [0] * self.n, 0.
+        self.queue = deque()
+        self.queued = [False] * self.n
+        self.set_tour(tour)
+
+    def set_tour(self, tour, tour_cost=None):
+        self.tour = list(tour)
+        for i, node in enumerate(self.tour):
+            self.pos[node] = i
+        if tour_cost is None:
+            tour_cost = sum(self.cost(self.tour[i], self.tour[(i + 1) % self.n]) for i in range(self.n))
+        self.tour_cost = tour_cost
+        self.queue.clear()
+        self.queued = [False] * self.n
+
+    def next(self, node):
+        return self.tour[(self.pos[node] + 1) % self.n]
+
+    def prev(self, node):
+        return self.tour[self.pos[node] - 1]
+
+    def reverse(self, first, last):
+        # Reverses the tour path from node first forward to node last, or the rest of the tour when that is
+        # shorter, both give the same cycle
+        i, j = self.pos[first], self.pos[last]
+        length = (j - i) % self.n + 1
+        if 2 * length > self.n:
+            i, j = (j + 1) % self.n, (i - 1) % self.n
+            length = self.n - length
+        tour, pos = self.tour, self.pos
+        for _ in range(length // 2):
+            tour[i], tour[j] = tour[j], tour[i]
+            pos[tour[i]] = i
+            pos[tour[j]] = j
+            i = (i + 1) % self.n
+            j = (j - 1) % self.n
+
+    def two_opt_move(self, a, b, c, d):
+        # Replaces the tour edges (a, b) and (c, d) by (a, c) and (b, d), b follows a the same way d follows c
+        if self.next(a) == b:
+            self.reverse(b, c)
+        else:
+            self.reverse(c, b)
+
+    def push(self, *nodes):
+        for node in nodes:
+            if not self.queued[node]:
+                self.queued[node] = True
+                self.queue.append(node)
+
+    def optimise(self, deadline=None):
+        # Runs until no node has an improving move or the deadline (perf_counter) passes
+        if not self.queue:
+            self.push(*self.tour)
+        while self.queue:
+            if deadline is not None and time.perf_counter() > deadline:
+                return False
+            node = self.queue.popleft()
+            self.queued[node] = False
+            for move in self.moves:
+                if move == '2-opt':
+                    improved = self.improve_2_opt(node)
+                elif move == 'or-opt':
+                    improved = self.improve_or_opt(node)
+                else:
+                    improved = self.improve_lin_kernighan(node)
+                if improved:
+                    self.improving_moves += 1
+                    self.push(node)
+                    break
+        return True
+
+    def improve_2_opt(self, a):
+        cost = self.cost
+        for forward in (True, False):
+            b = self.next(a) if forward else self.prev(a)
+            removed = cost(a, b)
+            for c in self.candidates[a]:
+                added = cost(a, c)
+                if added >= removed:
+                    break
+                d = self.next(c) if forward else self.prev(c)
+                if c == b or d == a:
+                    continue
+                delta = added + cost(b, d) - removed - cost(c, d)
+                if delta < -1e-10:
+                    if forward:
+                        self.two_opt_move(a, b, c, d)
+                    else:
+                        self.two_opt_move(b, a, d, c)
+                    self.tour_cost += delta
+                    self.push(a, b, c, d)
+                    return True
+        return False
+
+    def improve_or_opt(self, s1):
+        # Moves the segment of 1 to 3 nodes starting at s1 between two neighbouring nodes elsewhere,
+        # in either orientation, as a sequence of 2-opt moves
+        cost = self.cost
+        for length in (1, 2, 3):
+            if length + 3 > self.n:
+                break
+            segment = [s1]
+            for _ in range(length - 1):
+                segment.append(self.next(segment[-1]))
+            s2 = segment[-1]
+            p, nx = self.prev(s1), self.next(s2)
+            removal_gain = cost(p, s1) + cost(s2, nx) - cost(p, nx)
+            if removal_gain <= 1e-10:
+                continue
+            for c in self.candidates[s1] + self.candidates[s2]:
+                if c in segment or c == p:
+                    continue
+                e = self.next(c)
+                if e in segment or e == p:
+                    continue
+                forward_delta = cost(c, s1) + cost(s2, e) - cost(c, e) - removal_gain
+                reversed_delta = cost(c, s2) + cost(s1, e) - cost(c, e) - removal_gain
+                delta = min(forward_delta, reversed_delta)
+                if delta < -1e-10:
+                    # p S X c e -> p c X' S' e -> p X S' e, with S' the reversed segment
+                    self.two_opt_move(p, s1, c, e)
+                    self.two_opt_move(p, c, nx, s2)
+                    if forward_delta < reversed_delta:
+                        self.two_opt_move(c, s2, s1, e)
+                    self.tour_cost += delta
+                    self.push(p, nx, s1, s2, c, e)
+                    return True
+        return False
+
+    def improve_lin_kernighan(self, t1):
+        # A Lin-Kernighan chain of 2-opt moves: break (t1, t2), join t2 to a candidate t3 and break (t3, t4),
+        # which closes the tour with (t4, t1). While the closed tour is not better and the partial gain stays
+        # positive, the chain goes on from (t1, t4) up to max_depth moves, otherwise it is undone.
+        cost = self.cost
+        for forward in (True, False):
+            t2 = self.next(t1) if forward else self.prev(t1)
+            gain = cost(t1, t2)
+            applied = []
+            touched = [t1, t2]
+            for _ in range(self.max_depth):
+                best_t3, best_t4, best_gain = None, None, -float('inf')
+                for t3 in self.candidates[t2]:
+                    partial_gain = gain - cost(t2, t3)
+                    if partial_gain <= 1e-10:
+                        break
+                    if t3 == t1:
+                        continue
+                    t4 = self.prev(t3) if self.next(t1) == t2 else self.next(t3)
+                    if t4 == t2 or t3 == t2:
+                        continue
+                    if partial_gain + cost(t3, t4) > best_gain:
+                        best_t3, best_t4, best_gain = t3, t4, partial_gain + cost(t3, t4)
+                if best_t3 is None:
+                    break
+                if self.next(t1) == t2:
+                    self.two_opt_move(t1, t2, best_t4, best_t3)
+                else:
+                    self.two_opt_move(t2, t1, best_t3, best_t4)
+                applied.append((t1, t2, best_t3, best_t4))
+                touched += [best_t3, best_t4]
+                gain = best_gain
+                closed_gain = gain - cost(best_t4, t1)
+                if closed_gain > 1e-10:
+                    self.tour_cost -= closed_gain
+                    self.push(*touched)
+                    return True
+                t2 = best_t4
+            # Undo the chain, every move is undone by the 2-opt move joining its old edges again
+            for t1_, t2_, t3_, t4_ in reversed(applied):
+                if self.next(t1_) == t4_:
+                    self.two_opt_move(t1_, t4_, t2_, t3_)
+                else:
+                    self.two_opt_move(t4_, t1_, t3_, t2_)
+        return False
+
+    def double_bridge(self, rng):
+        # Random 4-opt kick that 2-opt and Or-opt cannot undo, the tour A B C D becomes A C B D
+        n = self.n
+        i, j, k = sorted(rng.sample(range(1, n), 3))
+        tour = self.tour
+        a, b, c, d = tour[:i], tour[i:j], tour[j:k], tour[k:]
+        cost = self.cost
+        ends = [(tour[i - 1], tour[i]), (tour[j - 1], tour[j]), (tour[k - 1], tour[k % n])]
+        self.tour = a + c + b + d
+        for position in range(i, k):
+            self.pos[self.tour[position]] = position
+        self.tour_cost += (cost(tour[i - 1], tour[j]) + cost(tour[k - 1], tour[i]) + cost(tour[j - 1], tour[k % n])
+                           - sum(cost(u, v) for u, v in ends))
+        self.push(*[node for edge in ends for node in edge])
 
 
 def test(number_of_nodes=4, number_of_tests=10):
@@ -304,21 +1128,79 @@ def test(number_of_nodes=4, number_of_tests=10):
         g = Graph(n, e)
         c, tsp_res = g.minimal_hamiltonian_path()
         bb_res = g.branch_and_bound()
+        hk_c, hk_res = g.held_karp()
 
         was_fine = True
-        if len(tsp_res) != len(bb_res):
+        if len(tsp_res) != len(bb_res) or len(tsp_res) != len(hk_res) or c != hk_c:
             was_fine = False
         for res in tsp_res:
-            if res not in bb_res:
+            if res not in bb_res or res not in hk_res:
                 was_fine = False
         if not was_fine:
             raise Exception('TSP results are not equal -> Test Failed!')
     print('Test Passed')
 
 
+def test_directed(number_of_nodes=5, number_of_tests=20):
+    # Held-Karp on oriented edges in both directions with different weights, every optimal tour is kept
+    for t in range(number_of_tests):
+        n = [Node(str(i)) for i in range(number_of_nodes)]
+        e = [Edge(n[n1], n[n2], random.randint(1, 10), is_oriented=True)
+             for n1 in range(len(n)) for n2 in range(len(n)) if n1 != n2]
+        g = Graph(n, e)
+        hk_c, hk_res = g.held_karp()
+        if not hk_res or any(abs(g.get_cost_of_path(res) - hk_c) > 1e-9 for res in hk_res):
+            raise Exception('Held-Karp lost the optimal directed tours -> Test Failed!')
+    print('Test Passed')
+
+
+# The graph and the shared incumbent of the process running parallel_branch_and_bound subtrees
+worker_state = {}
+
+
+def init_parallel_worker(graph, bound, penalties, incumbent):
+    worker_state.update(graph=graph, bound=bound, penalties=penalties, incumbent=incumbent, tree_costs={})
+
+
+def branch_and_bound_worker(prefix_with_cost):
+    prefix, prefix_cost = prefix_with_cost
+    return worker_state['graph'].branch_subtree(prefix, prefix_cost, worker_state['bound'],
+                                                worker_state['penalties'], worker_state['incumbent'],
+                                                worker_state['tree_costs'])
+
+
+def compare_bounds(number_of_nodes=10, number_of_tests=5, bounds=('min-est', '1-tree', 'lagrangian'), seed=0):
+    # Runs branch and bound with every bound on the same random graphs and prints the explored states,
+    # the pruned branches, the share of pruned branches and the runtime averaged over the graphs
+    rng = random.Random(seed)
+    graphs = []
+    for t in range(number_of_tests):
+        n = [Node(str(i)) for i in range(number_of_nodes)]
+        e = [Edge(n[n1], n[n2], rng.randint(1, 10)) for n1 in range(len(n)) for n2 in range(len(n)) if n1 < n2]
+        graphs.append(Graph(n, e))
+
+    results = {}
+    for bound in bounds:
+        states_explored, num_of_pruned, total_time = 0, 0, 0.
+        for g in graphs:
+            start = time.perf_counter()
+            g.branch_and_bound(bound)
+            total_time += time.perf_counter() - start
+            states_explored += g.states_explored
+            num_of_pruned += g.num_of_pruned
+        pruning_ratio = num_of_pruned / max(num_of_pruned + states_explored, 1)
+        results[bound] = (states_explored / number_of_tests, num_of_pruned / number_of_tests,
+                          pruning_ratio, total_time / number_of_tests)
+        print(bound, 'states explored:', states_explored / number_of_tests,
+              'pruned branches:', num_of_pruned / number_of_tests,
+              'pruning ratio:', round(pruning_ratio, 3), 'time:', round(total_time / number_of_tests, 4), 'seconds')
+    return results
+
+
 if __name__ == '__main__':
     # Testing the branch and bound:
     # test(6, 100)
+    # test_directed(5, 20)
 
     # Nodes
     # Adding nodes increase the computing complexity quickly
@@ -376,3 +1258,26 @@ if __name__ == '__main__':
     print('compared to worst case: ', str(len(nodes) - 1) + '! =', fact(len(nodes) - 1))
     print('calculation took:', (end - start), 'seconds')
     print('cost of path', graph.get_cost_of_path(bb_result[0]))
+
+    # Best first search without recursion, stopped after 5 seconds it returns the best tour so far
+    # and how far from the optimum it can be at most
+    # cost, tour, gap = graph.best_first_branch_and_bound(max_seconds=5)
+    # print('best first cost:', cost, 'optimality gap:', gap)
+
+    # The same search split over a process pool, the subtrees share the best cost found so far
+    # bb_result = graph.parallel_branch_and_bound(split_depth=2)
+
+    # Thousands of nodes are out of reach of the exact solvers, the heuristic returns a tour and its gap
+    # to the Held-Karp lower bound
+    # cost, tour, gap = graph.heuristic_tsp(time_limit=10)
+    # print('heuristic cost:', cost, 'gap to lower bound:', gap)
+
+    # Comparing the pruning of the bounds available to branch and bound:
+    # compare_bounds(10, 5)
+
+    # Held-Karp time doubles with every node, on one core it took about 1 s for 20 nodes, 14 s for 23 and
+    # 70 s for 25. The table takes 2^(n-1) * (n-1) * 4 bytes for small integer costs and 8 bytes otherwise,
+    # so 25 nodes only fit the default max_memory in float32, peaking at about 1.7 GB
+    # start = time.time()
+    # hk_cost, hk_result = graph.held_karp()
+    # print('Held-Karp cost:', hk_cost, 'took:', time.time() - start, 'seconds')
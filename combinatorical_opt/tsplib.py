@@ -0,0 +1,282 @@
+import csv
+import math
+import time
+
+import numpy as np
+
+from travelling_salesman_problem import Graph, Node
+
+# Optimal tour lengths of TSPLIB instances published with the library
+KNOWN_OPTIMA = {
+    'burma14': 3323, 'ulysses16': 6859, 'gr17': 2085, 'gr21': 2707, 'ulysses22': 7013, 'gr24': 1272,
+    'fri26': 937, 'bayg29': 1610, 'bays29': 2020, 'dantzig42': 699, 'swiss42': 1273, 'att48': 10628,
+    'gr48': 5046, 'hk48': 11461, 'eil51': 426, 'berlin52': 7542, 'brazil58': 25395, 'st70': 675,
+    'eil76': 538, 'pr76': 108159, 'gr96': 55209, 'rat99': 1211, 'kroA100': 21282, 'kroB100': 22141,
+    'lin105': 14379, 'ch130': 6110, 'gr137': 69853, 'ch150': 6528, 'd198': 15780, 'gr202': 40160,
+    'a280': 2579, 'pcb442': 50778, 'att532': 27686, 'rat783': 8806, 'pr1002': 259045,
+}
+
+GEO_RADIUS = 6378.388
+GEO_PI = 3.141592
+
+
+def geo_radians(coordinates):
+    # TSPLIB GEO coordinates are DDD.MM degrees and minutes, the integer part is truncated as in the library
+    degrees = np.trunc(coordinates)
+    return GEO_PI * (degrees + 5. * (coordinates - degrees) / 3.) / 180.
+
+
+def geometric_distances(a, b, distance_type):
+    # TSPLIB distances between the points of a and b (arrays of shape (..., 2), broadcast against each other),
+    # GEO points are (latitude, longitude) already in radians
+    if distance_type == 'GEO':
+        q1 = np.cos(a[..., 1] - b[..., 1])
+        q2 = np.cos(a[..., 0] - b[..., 0])
+        q3 = np.cos(a[..., 0] + b[..., 0])
+        return np.floor(GEO_RADIUS * np.arccos(np.clip(0.5 * ((1. + q1) * q2 - (1. - q1) * q3), -1., 1.)) + 1.)
+    dx = a[..., 0] - b[..., 0]
+    dy = a[..., 1] - b[..., 1]
+    if distance_type == 'EUC_2D':
+        return np.floor(np.sqrt(dx * dx + dy * dy) + 0.5)
+    if distance_type == 'CEIL_2D':
+        return np.ceil(np.sqrt(dx * dx + dy * dy))
+    if distance_type == 'ATT':
+        r = np.sqrt((dx * dx + dy * dy) / 10.)
+        t = np.floor(r + 0.5)
+        return np.where(t < r, t + 1., t)
+    raise Exception('Unsupported EDGE_WEIGHT_TYPE ' + str(distance_type))
+
+
+def distance_function(coordinates, distance_type):
+    # The same distances one pair at a time in plain Python, local search asks for millions of single costs
+    x = coordinates[:, 0].tolist()
+    y = coordinates[:, 1].tolist()
+    inf = float('inf')
+
+    if distance_type == 'EUC_2D':
+        def distance(i, j):
+            if i == j:
+                return inf
+            return float(math.floor(math.sqrt((x[i] - x[j]) ** 2 + (y[i] - y[j]) ** 2) + 0.5))
+    elif distance_type == 'CEIL_2D':
+        def distance(i, j):
+            if i == j:
+                return inf
+            return float(math.ceil(math.sqrt((x[i] - x[j]) ** 2 + (y[i] - y[j]) ** 2)))
+    elif distance_type == 'ATT':
+        def distance(i, j):
+            if i == j:
+                return inf
+            r = math.sqrt(((x[i] - x[j]) ** 2 + (y[i] - y[j]) ** 2) / 10.)
+            t = math.floor(r + 0.5)
+            return float(t + 1 if t < r else t)
+    elif distance_type == 'GEO':
+        def distance(i, j):
+            if i == j:
+                return inf
+            q1 = math.cos(y[i] - y[j])
+            q2 = math.cos(x[i] - x[j])
+            q3 = math.cos(x[i] + x[j])
+            return float(math.floor(GEO_RADIUS * math.acos(max(-1., min(1., 0.5 * ((1. + q1) * q2 - (1. - q1) * q3))))
+                                    + 1.))
+    else:
+        raise Exception('Unsupported EDGE_WEIGHT_TYPE ' + str(distance_type))
+    return distance
+
+
+class LazyGraph(Graph):
+    # Graph without Edge objects, the costs come from node coordinates or from an explicit matrix. Coordinate
+    # costs are computed when asked for, the dense cost_matrix is only built when an exact solver needs it.
+
+    def __init__(self, names, coordinates=None, distance_type='EUC_2D', matrix=None):
+        if (coordinates is None) == (matrix is None):
+            raise Exception('LazyGraph needs either coordinates or a matrix')
+        self.distance_type = 'EXPLICIT' if matrix is not None else distance_type
+        self.coordinates = None
+        self.dense_costs = None
+        self.dense_undirected_costs = None
+        self.dense_min_edge_weights = None
+        self.coordinate_distance = None
+        if matrix is not None:
+            self.dense_costs = np.array(matrix, dtype=np.float64)
+            np.fill_diagonal(self.dense_costs, np.inf)
+        else:
+            self.coordinates = np.array(coordinates, dtype=np.float64)
+            if distance_type == 'GEO':
+                self.coordinates = geo_radians(self.coordinates)
+            geometric_distances(self.coordinates[:1], self.coordinates[:1], distance_type)  # rejects unknown types
+        super().__init__([Node(str(name)) for name in names], [])
+
+    def build_cost_matrix(self):
+        self.node_indices = {node: i for i, node in enumerate(self.V)}
+
+    @property
+    def cost_matrix(self):
+        if self.dense_costs is None:
+            n = len(self.V)
+            self.dense_costs = np.empty((n, n))
+            for first in range(0, n, 1024):
+                rows = np.arange(first, min(first + 1024, n))
+                self.dense_costs[rows] = self.undirected_cost_rows(rows)
+        return self.dense_costs
+
+    @property
+    def undirected_costs(self):
+        if self.coordinates is not None:
+            return self.cost_matrix
+        if self.dense_undirected_costs is None:
+            self.dense_undirected_costs = np.minimum(self.dense_costs, self.dense_costs.T)
+        return self.dense_undirected_costs
+
+    @property
+    def min_edge_weights(self):
+        if self.dense_min_edge_weights is None:
+            self.dense_min_edge_weights = self.undirected_costs.min(axis=1)
+        return self.dense_min_edge_weights
+
+    def costs_between(self, sources, targets):
+        if self.coordinates is None:
+            return self.dense_costs[sources, targets]
+        costs = geometric_distances(self.coordinates[sources], self.coordinates[targets], self.distance_type)
+        return np.where(np.asarray(sources) == np.asarray(targets), np.inf, costs)
+
+    def undirected_cost_rows(self, rows):
+        if self.coordinates is None:
+            return np.minimum(self.dense_costs[rows], self.dense_costs[:, rows].T)
+        costs = geometric_distances(self.coordinates[rows][:, None], self.coordinates[None, :], self.distance_type)
+        costs[np.arange(len(rows)), rows] = np.inf
+        return costs
+
+    def cost_function(self):
+        if self.coordinates is None:
+            return self.dense_costs.item
+        # Built once, Graph.get_cost_between_nodes asks for it on every lookup
+        if self.coordinate_distance is None:
+            self.coordinate_distance = distance_function(self.coordinates, self.distance_type)
+        return self.coordinate_distance
+
+    def is_symmetric(self):
+        return self.coordinates is not None or np.array_equal(self.dense_costs, self.dense_costs.T)
+
+    def is_complete(self):
+        return self.coordinates is not None or super().is_complete()
+
+    def get_neighbour_nodes(self, node):
+        # Every other node, the cheapest first like the weight sorted edges of a Graph
+        i = self.node_indices[node]
+        costs = self.costs_between(np.full(len(self.V), i), np.arange(len(self.V)))
+        order = np.argsort(costs, kind='stable')
+        return [self.V[j] for j in order if np.isfinite(costs[j])]
+
+
+def explicit_matrix(weights, n, edge_weight_format):
+    # Builds the full matrix out of the numbers of an EDGE_WEIGHT_SECTION
+    matrix = np.zeros((n, n))
+    if edge_weight_format == 'FULL_MATRIX':
+        return np.array(weights[:n * n], dtype=np.float64).reshape(n, n)
+    # A column format of one triangle lists the same numbers as the row format of the other triangle
+    formats = {'UPPER_COL': 'LOWER_ROW', 'LOWER_COL': 'UPPER_ROW',
+               'UPPER_DIAG_COL': 'LOWER_DIAG_ROW', 'LOWER_DIAG_COL': 'UPPER_DIAG_ROW'}
+    edge_weight_format = formats.get(edge_weight_format, edge_weight_format)
+    if edge_weight_format == 'UPPER_ROW':
+        rows, columns = np.triu_indices(n, 1)
+    elif edge_weight_format == 'LOWER_ROW':
+        rows, columns = np.tril_indices(n, -1)
+    elif edge_weight_format == 'UPPER_DIAG_ROW':
+        rows, columns = np.triu_indices(n)
+    elif edge_weight_format == 'LOWER_DIAG_ROW':
+        rows, columns = np.tril_indices(n)
+    else:
+        raise Exception('Unsupported EDGE_WEIGHT_FORMAT ' + str(edge_weight_format))
+    matrix[rows, columns] = weights[:len(rows)]
+    matrix[columns, rows] = weights[:len(rows)]
+    return matrix
+
+
+def load_tsplib(file_path):
+    # Reads a TSPLIB TSP or ATSP file into a LazyGraph, the specification keys are kept in graph.specification
+    specification = {}
+    names, coordinates, weights = [], [], []
+    section = None
+    with open(file_path) as f:
+        for line in f:
+            line = line.strip()
+            if line == 'EOF':
+                break
+            if not line:
+                continue
+            # Keywords and section names start with a letter, section data with a number
+            if line[0].isalpha():
+                key = line.split(':', 1)[0].strip()
+                if key.endswith('_SECTION'):
+                    section = key
+                else:
+                    specification[key] = line.split(':', 1)[1].strip() if ':' in line else ''
+                    section = None
+                continue
+            if section == 'NODE_COORD_SECTION':
+                parts = line.split()
+                names.append(parts[0])
+                coordinates.append((float(parts[1]), float(parts[2])))
+            elif section == 'EDGE_WEIGHT_SECTION':
+                weights.extend(float(value) for value in line.split())
+
+    if specification.get('TYPE', 'TSP') not in ('TSP', 'ATSP'):
+        raise Exception('Unsupported TSPLIB TYPE ' + specification['TYPE'])
+    n = int(specification['DIMENSION'])
+    distance_type = specification.get('EDGE_WEIGHT_TYPE', 'EUC_2D')
+    if distance_type == 'EXPLICIT':
+        matrix = explicit_matrix(weights, n, specification.get('EDGE_WEIGHT_FORMAT', 'FULL_MATRIX'))
+        graph = LazyGraph([str(i + 1) for i in range(n)], matrix=matrix)
+    else:
+        if len(coordinates) != n:
+            raise Exception('NODE_COORD_SECTION has ' + str(len(coordinates)) + ' nodes, DIMENSION is ' + str(n))
+        graph = LazyGraph(names, coordinates=coordinates, distance_type=distance_type)
+    graph.specification = specification
+    return graph
+
+
+def run_benchmark(file_paths, time_limit=10., max_exact_nodes=16, bound_iterations=100, results_path=None, seed=0):
+    # Solves every instance with the heuristic and, up to max_exact_nodes nodes, with Held-Karp, and compares
+    # the costs with the known optimum and the lower bound
+    results = []
+    for file_path in file_paths:
+        time_start = time.perf_counter()
+        graph = load_tsplib(file_path)
+        load_time = time.perf_counter() - time_start
+        name = graph.specification.get('NAME', file_path)
+        optimum = KNOWN_OPTIMA.get(name)
+
+        solvers = []
+        if graph.is_symmetric():
+            solvers.append(('heuristic', lambda: graph.heuristic_tsp(time_limit=time_limit, seed=seed,
+                                                                      bound_iterations=bound_iterations)[::2]))
+        if len(graph.V) <= max_exact_nodes:
+            solvers.append(('held-karp', lambda: (graph.held_karp(all_optimal=False)[0], 0.)))
+        for solver_name, solve in solvers:
+            time_start = time.perf_counter()
+            cost, gap = solve()
+            solve_time = time.perf_counter() - time_start
+            optimum_gap = None if optimum is None else (cost - optimum) / optimum
+            result = (name, len(graph.V), graph.distance_type, solver_name, cost, optimum, optimum_gap, gap,
+                      load_time, solve_time)
+            results.append(result)
+            print(name, len(graph.V), solver_name, 'cost:', cost, 'optimum:', optimum,
+                  'gap to optimum:', None if optimum_gap is None else round(optimum_gap, 4),
+                  'gap to lower bound:', None if gap is None else round(gap, 4),
+                  'load:', round(load_time, 3), 's', 'solve:', round(solve_time, 3), 's')
+
+    if results_path is not None:
+        with open(results_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['name', 'nodes', 'edge_weight_type', 'solver', 'cost', 'optimum', 'optimum_gap',
+                             'lower_bound_gap', 'load_time', 'solve_time'])
+            writer.writerows(results)
+    return results
+
+
+if __name__ == '__main__':
+    # TSPLIB instances are not shipped with the repository, download them from the TSPLIB page, e.g.
+    # run_benchmark(['burma14.tsp', 'ulysses16.tsp', 'att48.tsp', 'berlin52.tsp', 'kroA100.tsp', 'pr1002.tsp'])
+    import sys
+    run_benchmark(sys.argv[1:])